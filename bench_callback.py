@@ -0,0 +1,163 @@
+"""
+Callback latency benchmark with a per-block deadline budget.
+Drives the render core (Synth.render_into a fake float32 outdata) the
+way the PortAudio callback does and reports p50/p99/max render time as
+a fraction of the block deadline (blocksize / FS).
+
+Sweeps polyphony, every wave type, every chorus/delay/reverb/convolution
+reverb combination and block sizes 32..1024 (the convolution partition
+follows the block size). Results are saved as JSON;
+with --baseline the run is compared to a stored result and
+regressions are flagged (exit code 1).
+
+Usage: python bench_callback.py [-o results.json] [--baseline base.json]
+       [--quick] [--blocks 200] [--tolerance 0.2] [--ir room.wav]
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from pyano.synth import Synth, FS, NOTE_KEYS
+
+POLYPHONY = [1, 4, 8, 16, 25]
+WAVES = ['sine', 'square', 'triangle', 'sawtooth']
+EFFECTS = ['chorus', 'delay', 'reverb', 'conv_reverb']
+BLOCKSIZES = [32, 64, 128, 256, 512, 1024]
+WARMUP_BLOCKS = 10
+
+
+def config_key(config):
+    return (config['voices'], config['wave'], tuple(config['effects']),
+            config['blocksize'])
+
+
+def make_synth(voices, wave_type, effects, blocksize, ir=None):
+    synth = Synth(FS, blocksize=blocksize)
+    synth.wave_type = wave_type
+    if 'conv_reverb' in effects:
+        synth.load_impulse_response(ir)
+    for name in EFFECTS:
+        getattr(synth, 'set_' + name)(name in effects)
+    for key in list(NOTE_KEYS)[:voices]:
+        synth.note_on(key)
+    return synth
+
+
+def measure(synth, blocksize, blocks):
+    """ Render time of every block in seconds """
+    outdata = np.zeros((blocksize, 1), dtype=np.float32)
+    out = outdata[:, 0]
+    for _ in range(WARMUP_BLOCKS):
+        synth.render_into(out)
+    times = np.empty(blocks)
+    for b in range(blocks):
+        start = time.perf_counter_ns()
+        synth.render_into(out)
+        times[b] = time.perf_counter_ns() - start
+    return times * 1e-9
+
+
+def run(polyphony, waves, effect_sets, blocksizes, blocks, ir=None):
+    results = []
+    for blocksize, voices, wave_type, effects in itertools.product(
+            blocksizes, polyphony, waves, effect_sets):
+        deadline = blocksize / FS
+        synth = make_synth(voices, wave_type, effects, blocksize, ir)
+        times = measure(synth, blocksize, blocks)
+        p50, p99 = np.percentile(times, [50, 99])
+        result = {
+            'voices': voices,
+            'wave': wave_type,
+            'effects': list(effects),
+            'blocksize': blocksize,
+            'deadline_ms': deadline * 1e3,
+            'p50': p50 / deadline,
+            'p99': p99 / deadline,
+            'max': float(times.max()) / deadline,
+        }
+        results.append(result)
+        print(f"bs={blocksize:5d} voices={voices:2d} {wave_type:9s} "
+              f"{'+'.join(effects) or 'dry':32s} p50={result['p50']:6.1%} "
+              f"p99={result['p99']:6.1%} max={result['max']:6.1%}"
+              f"{'  DEADLINE' if result['p99'] > 1.0 else ''}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions: configurations whose p99 grew by more than tolerance
+    (relative) over the baseline, or that now miss the deadline.
+    """
+    base = {config_key(r): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        b = base.get(config_key(r))
+        if b is None:
+            continue
+        if r['p99'] > b['p99'] * (1 + tolerance) or \
+                (r['p99'] > 1.0 >= b['p99']):
+            regressions.append((r, b))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-o', '--output', default='bench_callback.json')
+    parser.add_argument('--baseline', help='stored JSON result to compare')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative p99 growth (default 0.2)')
+    parser.add_argument('--blocks', type=int, default=200)
+    parser.add_argument('--ir', help='impulse response WAV for the '
+                        'convolution reverb (default: 2 s synthetic room)')
+    parser.add_argument('--quick', action='store_true',
+                        help='64-frame blocks, 1/8/25 voices, sine only')
+    args = parser.parse_args()
+
+    polyphony, waves, blocksizes = POLYPHONY, WAVES, BLOCKSIZES
+    if args.quick:
+        polyphony, waves, blocksizes = [1, 8, 25], ['sine'], [64]
+    effect_sets = [combo for n in range(len(EFFECTS) + 1)
+                   for combo in itertools.combinations(EFFECTS, n)]
+
+    results = run(polyphony, waves, effect_sets, blocksizes, args.blocks,
+                  args.ir)
+    report = {
+        'meta': {
+            'fs': FS,
+            'blocks': args.blocks,
+            'ir': args.ir or 'synthetic',
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved {len(results)} results to {args.output}")
+
+    missed = [r for r in results if r['p99'] > 1.0]
+    if missed:
+        print(f"{len(missed)} configurations miss the deadline at p99")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for r, b in regressions:
+            print(f"REGRESSION bs={r['blocksize']} voices={r['voices']} "
+                  f"{r['wave']} {'+'.join(r['effects']) or 'dry'}: "
+                  f"p99 {b['p99']:.1%} -> {r['p99']:.1%}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Micro-benchmark: envelope cost per voice per block.
+Compares the old per-sample envelope_adsr() loop and a single-voice
+block Envelope (both kept here as references) with what the synth
+runs: render_envelopes() over a whole voice pool, with its
+EnvelopeScratch, divided by the number of voices.
+
+Usage: python bench_envelope.py [blocksize] [blocks] [voices]
+"""
+import sys
+import time
+
+import numpy as np
+
+from pyano.envelope import ADSR, IDLE, ATTACK, DECAY, SUSTAIN, RELEASE, \
+    EnvelopeScratch, render_envelopes
+
+FS = 48000
+EPS = 1e-9  # absorbs rounding at segment ends
+
+
+def envelope_adsr_legacy(note_on, note_off, t):
+    """ Per-sample envelope as it was in app_console.py (reference) """
+    env = np.zeros_like(t)
+    for i in range(len(t)):
+        time_since_on = t[i] - note_on
+        if note_off is None or t[i] < note_off:
+            if time_since_on < ADSR['attack']:
+                env[i] = time_since_on / max(ADSR['attack'], 1e-6)
+            elif time_since_on < ADSR['attack'] + ADSR['decay']:
+                env[i] = 1 - (time_since_on - ADSR['attack']) / \
+                    max(ADSR['decay'], 1e-6) * (1 - ADSR['sustain'])
+            else:
+                env[i] = ADSR['sustain']
+        else:
+            time_since_off = t[i] - note_off
+            if time_since_off < ADSR['release']:
+                env[i] = ADSR['sustain'] * \
+                    (1 - time_since_off / max(ADSR['release'], 1e-6))
+            else:
+                env[i] = 0.0
+    return env
+
+
+class Envelope:
+    """
+    Stateful linear ADSR for a single voice (reference: the block
+    envelope before the voice pool rendered all voices at once).
+    The state is the current segment and the current level, so every
+    block is filled segment by segment with NumPy slices instead of
+    evaluating the envelope sample by sample.
+    """
+    __slots__ = ('stage', 'level', 'release_step', 'fs', 'adsr')
+
+    def __init__(self, fs, adsr=ADSR):
+        self.fs = fs
+        self.adsr = adsr
+        self.stage = IDLE
+        self.level = 0.0
+        self.release_step = 0.0
+
+    def note_on(self):
+        # Attack continues from the current level (no click on retrigger)
+        self.stage = ATTACK
+
+    def note_off(self):
+        """
+        Start the release from the level the voice has right now,
+        so a note released during attack/decay fades from where it is.
+        """
+        if self.stage == IDLE:
+            return
+        self.stage = RELEASE
+        self.release_step = self.level / \
+            max(self.adsr['release'] * self.fs, 1.0)
+
+    @property
+    def active(self):
+        return self.stage != IDLE
+
+    def render(self, out):
+        """
+        out: float array for the block, filled in place
+        Returns out
+        """
+        frames = len(out)
+        pos = 0
+        fs = self.fs
+        adsr = self.adsr
+        while pos < frames:
+            remaining = frames - pos
+            if self.stage == ATTACK:
+                step = 1.0 / max(adsr['attack'] * fs, 1.0)
+                n = min(remaining, int(np.ceil((1.0 - self.level) / step)))
+                n = max(n, 1)
+                ramp = out[pos:pos + n]
+                np.multiply(np.arange(1, n + 1), step, out=ramp)
+                ramp += self.level
+                np.minimum(ramp, 1.0, out=ramp)
+                self.level = float(ramp[-1])
+                if self.level >= 1.0 - EPS:
+                    self.level = 1.0
+                    self.stage = DECAY
+            elif self.stage == DECAY:
+                sustain = adsr['sustain']
+                step = (1.0 - sustain) / max(adsr['decay'] * fs, 1.0)
+                if step <= 0.0 or self.level <= sustain:
+                    self.stage = SUSTAIN
+                    continue
+                n = min(remaining,
+                        max(int(np.ceil((self.level - sustain) / step)), 1))
+                ramp = out[pos:pos + n]
+                np.multiply(np.arange(1, n + 1), -step, out=ramp)
+                ramp += self.level
+                np.maximum(ramp, sustain, out=ramp)
+                self.level = float(ramp[-1])
+                if self.level <= sustain + EPS:
+                    self.stage = SUSTAIN
+            elif self.stage == SUSTAIN:
+                n = remaining
+                self.level = adsr['sustain']
+                out[pos:] = self.level
+            elif self.stage == RELEASE:
+                step = self.release_step
+                if step <= 0.0 or self.level <= 0.0:
+                    self.level = 0.0
+                    self.stage = IDLE
+                    continue
+                n = min(remaining,
+                        max(int(np.ceil(self.level / step)), 1))
+                ramp = out[pos:pos + n]
+                np.multiply(np.arange(1, n + 1), -step, out=ramp)
+                ramp += self.level
+                np.maximum(ramp, 0.0, out=ramp)
+                self.level = float(ramp[-1])
+                if self.level <= EPS:
+                    self.level = 0.0
+                    self.stage = IDLE
+            else:
+                n = remaining
+                out[pos:] = 0.0
+            pos += n
+        return out
+
+
+def bench_legacy(blocksize, blocks):
+    # Key held for half of the run, then released
+    note_off = blocks * blocksize / FS / 2
+    start = time.perf_counter()
+    for b in range(blocks):
+        t = (np.arange(blocksize) + b * blocksize) / FS
+        envelope_adsr_legacy(0.0, note_off if t[0] >= note_off else None, t)
+    return (time.perf_counter() - start) / blocks
+
+
+def bench_block(blocksize, blocks):
+    env = Envelope(FS)
+    out = np.empty(blocksize)
+    env.note_on()
+    start = time.perf_counter()
+    for b in range(blocks):
+        if b == blocks // 2:
+            env.note_off()
+        if not env.active:
+            env.note_on()
+        env.render(out)
+    return (time.perf_counter() - start) / blocks
+
+
+def bench_pool(blocksize, blocks, voices, dtype=np.float32):
+    """ render_envelopes as VoicePool calls it, per voice """
+    stage = np.full(voices, ATTACK, dtype=np.int8)
+    level = np.zeros(voices, dtype=dtype)
+    release_step = np.zeros(voices, dtype=dtype)
+    out = np.empty((voices, blocksize), dtype=dtype)
+    scratch = EnvelopeScratch(voices, blocksize, dtype)
+    start = time.perf_counter()
+    for b in range(blocks):
+        if b == blocks // 2:
+            # Release from the current level, as VoicePool.note_off
+            np.multiply(level, 1.0 / max(ADSR['release'] * FS, 1.0),
+                        out=release_step)
+            stage.fill(RELEASE)
+        if not stage.any():
+            stage.fill(ATTACK)
+        render_envelopes(stage, level, release_step, out, FS, scratch)
+    return (time.perf_counter() - start) / blocks / voices
+
+
+def main():
+    blocksize = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    voices = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    budget = blocksize / FS
+    legacy = bench_legacy(blocksize, blocks)
+    block = bench_block(blocksize, blocks)
+    pool = bench_pool(blocksize, blocks, voices)
+    print(f"Block: {blocksize} frames ({budget * 1e3:.3f} ms budget)")
+    print(f"  per-sample envelope_adsr: {legacy * 1e6:8.2f} us/voice/block "
+          f"({legacy / budget * 100:.1f}% of budget)")
+    print(f"  single-voice Envelope:    {block * 1e6:8.2f} us/voice/block "
+          f"({block / budget * 100:.1f}% of budget)")
+    print(f"  render_envelopes, {voices:2d} voices: {pool * 1e6:5.2f} "
+          f"us/voice/block ({pool / budget * 100:.1f}% of budget)")
+    print(f"  speedup over per-sample: {legacy / pool:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
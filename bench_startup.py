@@ -0,0 +1,126 @@
+"""
+Headless startup benchmark: import and engine construction time.
+Every run is a fresh interpreter that imports pyano, builds a Synth,
+builds a second one (shared tables already in place) and renders the
+first block, timing each step. Also checks that none of that imported
+an audio or keyboard backend. Results are saved as JSON; with
+--baseline the run is compared to a stored result and regressions are
+flagged (exit code 1).
+
+Usage: python bench_startup.py [-o results.json] [--baseline base.json]
+       [--runs 10] [--tolerance 0.3]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+STEPS = ['interpreter', 'import_numpy', 'import_pyano', 'construct',
+         'construct_again', 'first_block']
+BACKENDS = ['sounddevice', 'pynput']
+
+# Runs in the child; prints one JSON line of step times in seconds
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import numpy
+t1 = time.perf_counter()
+import pyano
+t2 = time.perf_counter()
+synth = pyano.Synth()
+t3 = time.perf_counter()
+pyano.Synth()
+t4 = time.perf_counter()
+synth.note_on('z')
+synth.render(256)
+t5 = time.perf_counter()
+print(json.dumps({
+    'import_numpy': t1 - t0, 'import_pyano': t2 - t1,
+    'construct': t3 - t2, 'construct_again': t4 - t3,
+    'first_block': t5 - t4,
+    'backends': [m for m in %r if m in sys.modules],
+}))
+""" % (BACKENDS,)
+
+
+def run_once():
+    root = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=root,
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    times = json.loads(result.stdout)
+    times['interpreter'] = total
+    return times
+
+
+def compare(results, baseline, tolerance):
+    """ Steps whose median grew by more than tolerance (relative) """
+    regressions = []
+    for step in STEPS:
+        new = results[step]['median']
+        old = baseline['results'].get(step, {}).get('median')
+        if old and new > old * (1 + tolerance):
+            regressions.append((step, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-o', '--output', default='bench_startup.json')
+    parser.add_argument('--baseline', help='stored JSON result to compare')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='allowed relative median growth (default 0.3)')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    results = {}
+    for step in STEPS:
+        times = np.array([r[step] for r in runs]) * 1e3
+        results[step] = {'median': float(np.median(times)),
+                         'max': float(times.max())}
+        print(f"{step:16s} median={results[step]['median']:8.2f} ms "
+              f"max={results[step]['max']:8.2f} ms")
+    backends = sorted({m for r in runs for m in r['backends']})
+    report = {
+        'meta': {
+            'runs': args.runs,
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+        'backends': backends,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved to {args.output}")
+
+    failed = False
+    if backends:
+        print(f"Headless startup imported: {', '.join(backends)}")
+        failed = True
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for step, old, new in regressions:
+            print(f"REGRESSION {step}: {old:.2f} ms -> {new:.2f} ms")
+        if regressions:
+            failed = True
+        else:
+            print(f"No regressions against {args.baseline}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
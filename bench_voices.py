@@ -0,0 +1,69 @@
+"""
+Benchmark: synthesis cost per block versus polyphony.
+Compares a per-note Python loop (one sine + envelope per note, as the
+old callback did) with the batched VoicePool render, and the pool with
+the envelope-driven resonant VoiceFilter on every voice.
+
+Usage: python bench_voices.py [blocksize] [blocks]
+"""
+import sys
+import time
+
+import numpy as np
+
+from bench_envelope import Envelope
+from pyano.voices import VoicePool
+from pyano.filters import VoiceFilter
+
+FS = 48000
+POLYPHONY = [1, 4, 8, 16, 25, 32, 64]
+
+
+def bench_loop(voices, blocksize, blocks):
+    envs = [Envelope(FS) for _ in range(voices)]
+    freqs = 220.0 * 2 ** (np.arange(voices) / 12)
+    for e in envs:
+        e.note_on()
+    env = np.empty(blocksize)
+    start = time.perf_counter()
+    for b in range(blocks):
+        t = (np.arange(blocksize) + b * blocksize) / FS
+        signal = np.zeros(blocksize)
+        for freq, e in zip(freqs, envs):
+            e.render(env)
+            signal += np.sin(2 * np.pi * freq * t) * env
+    return (time.perf_counter() - start) / blocks
+
+
+def bench_pool(voices, blocksize, blocks, filtered=False):
+    pool = VoicePool(FS, capacity=max(voices, 64))
+    if filtered:
+        pool.filter = VoiceFilter(FS, pool.capacity, cutoff=800.0,
+                                  resonance=0.5, env_amount=3.0)
+    for v in range(voices):
+        pool.note_on(v, 220.0 * 2 ** (v / 12))
+    start = time.perf_counter()
+    for b in range(blocks):
+        pool.render(blocksize, 'sine')
+    return (time.perf_counter() - start) / blocks
+
+
+def main():
+    blocksize = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    budget = blocksize / FS
+    print(f"Block: {blocksize} frames ({budget * 1e3:.3f} ms budget)")
+    print(f"{'voices':>6} {'per-note loop':>16} {'voice pool':>16} "
+          f"{'pool + filter':>16}")
+    for voices in POLYPHONY:
+        loop = bench_loop(voices, blocksize, blocks)
+        pool = bench_pool(voices, blocksize, blocks)
+        filtered = bench_pool(voices, blocksize, blocks, filtered=True)
+        print(f"{voices:>6} {loop * 1e6:>10.1f} us "
+              f"({loop / budget * 100:4.0f}%) {pool * 1e6:>7.1f} us "
+              f"({pool / budget * 100:4.0f}%) {filtered * 1e6:>7.1f} us "
+              f"({filtered / budget * 100:4.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
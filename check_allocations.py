@@ -0,0 +1,175 @@
+"""
+Steady-state allocation check for the real-time audio callback.
+Runs app_console.py's own audio_callback (with take_events and
+publish_status) on a preallocated float32 outdata: the callback
+functions are compiled from the app's source with stub globals in
+place of the stream, keyboard and UI thread, so no device is needed.
+tracemalloc watches the traced memory for the render core alone
+(Synth.render_into), the whole callback, and the callback around a
+silent source (the app's own part: clock, events, status, telemetry,
+governor). After warm-up a block may only create short-lived objects
+(array views, floats, NumPy's iterator state) that are freed before
+it returns:
+- retained: memory held after the measured blocks must have grown by
+  less than a byte per block (tracemalloc's own bookkeeping moves it
+  by a few dozen bytes), so no block leaves an object behind;
+- core and callback peak: below half a block of samples, so no block
+  buffer is allocated (NumPy's iterator state is a few KB whatever
+  the block size, hence the large default block);
+- app peak: less than APP_PEAK_LIMIT above a no-op's (the tracing
+  itself), room for a view and a few scalars, so the app builds no
+  event list per block;
+- status: with nothing changing, no snapshot is published.
+
+Runs every wave type dry and with all effects on.
+Usage: python check_allocations.py [--blocksize 4096] [--voices 16]
+       [--blocks 200]
+Exit code 1 if the callback allocates.
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from pyano.synth import Synth, FS, NOTE_KEYS
+from pyano.events import EventQueue, BlockClock
+from pyano.effects import block_peak
+from pyano.governor import Governor
+from pyano.profiler import PROFILER
+from pyano.telemetry import Telemetry
+from pyano.ui import snapshot, is_current
+
+WAVES = ['sine', 'square', 'triangle', 'sawtooth']
+EFFECTS = ['filter', 'chorus', 'delay', 'reverb', 'conv_reverb']
+WARMUP_BLOCKS = 200  # until NumPy's small-object caches have settled
+APP_PEAK_LIMIT = 320  # bytes: the app's transient objects per block
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                   'app_console.py')
+CALLBACK_FUNCTIONS = ('take_events', 'publish_status', 'callback',
+                      'audio_callback')
+
+
+def make_synth(voices, wave_type, effects, blocksize):
+    synth = Synth(FS, blocksize=blocksize, max_block=blocksize)
+    synth.wave_type = wave_type
+    for name in EFFECTS:
+        getattr(synth, 'set_' + name)(effects)
+    for key in list(NOTE_KEYS)[:voices]:
+        synth.note_on(key)
+    return synth
+
+
+class CountingDisplay:
+    """ Stands in for StatusDisplay: counts the published snapshots """
+
+    def __init__(self):
+        self.peak = 0.0
+        self.published = 0
+
+    def publish(self, snap):
+        self.published += 1
+
+
+class SilentSource:
+    """ Stands in for the synth's rendering: the block stays as it is """
+
+    def render_into(self, out, events=()):
+        return out
+
+
+def app_callback(synth, source=None):
+    """
+    app_console's audio_callback bound to stub globals: the app's
+    state objects around synth, no stream, listener or UI thread.
+    source: rendered instead of synth (as the app does for layers)
+    """
+    with open(APP, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), APP)
+    tree.body = [node for node in tree.body
+                 if isinstance(node, ast.FunctionDef)
+                 and node.name in CALLBACK_FUNCTIONS]
+    namespace = {
+        'time': time, 'PROFILER': PROFILER, 'synth': synth,
+        'engine': source, 'renderer': None, 'recorder': None,
+        'NOTE_KEYS': NOTE_KEYS, 'NOTE_LIST': list(NOTE_KEYS),
+        'note_events': EventQueue(256), 'clock': BlockClock(FS),
+        'held_keys': set(), 'held_notes': (), 'pending': [],
+        'due_events': [], 'status': None,
+        'display': CountingDisplay(), 'snapshot': snapshot,
+        'is_current': is_current, 'block_peak': block_peak,
+        'telemetry': Telemetry(FS), 'governor': Governor(synth),
+        'SPAN_CALLBACK': PROFILER.span('callback'),
+        'SPAN_EVENTS': PROFILER.span('events'),
+        'SPAN_UI': PROFILER.span('ui'),
+    }
+    exec(compile(tree, APP, 'exec'), namespace)
+    return namespace['audio_callback']
+
+
+def traced_growth(block, blocks):
+    """ (peak growth, retained growth) in bytes over blocks calls """
+    for _ in range(WARMUP_BLOCKS):
+        block()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(blocks):
+        block()
+    current, peak = tracemalloc.get_traced_memory()
+    return peak - before, current - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--blocksize', type=int, default=4096)
+    parser.add_argument('--voices', type=int, default=16)
+    parser.add_argument('--blocks', type=int, default=200)
+    args = parser.parse_args()
+
+    frames = args.blocksize
+    outdata = np.zeros((frames, 1), dtype=np.float32)
+    core_limit = outdata.nbytes // 2
+    failed = 0
+    tracemalloc.start()
+    tracing, _ = traced_growth(lambda: None, args.blocks)
+    for effects in (False, True):
+        for wave_type in WAVES:
+            synth = make_synth(args.voices, wave_type, effects, frames)
+            core_peak, core_kept = traced_growth(
+                lambda: synth.render_into(outdata[:, 0]), args.blocks)
+            synth = make_synth(args.voices, wave_type, effects, frames)
+            callback = app_callback(synth)
+            peak, kept = traced_growth(
+                lambda: callback(outdata, frames, None, None), args.blocks)
+            app = app_callback(synth, SilentSource())
+            display = app.__globals__['display']
+            published = display.published
+            app_peak, app_kept = traced_growth(
+                lambda: app(outdata, frames, None, None), args.blocks)
+            app_peak -= tracing
+            # Only the first block publishes: nothing changes after it
+            published = display.published - max(published, 1)
+            ok = max(core_peak, peak) < core_limit and \
+                app_peak < APP_PEAK_LIMIT and published == 0 and \
+                max(core_kept, kept, app_kept) < args.blocks
+            failed += not ok
+            print(f"{wave_type:9s} {'effects' if effects else 'dry':8s} "
+                  f"peak core +{core_peak:5d} B callback +{peak:5d} B "
+                  f"app +{app_peak:4d} B  retained "
+                  f"{max(core_kept, kept, app_kept):+4d} B  "
+                  f"snapshots {published}  "
+                  f"{'ok' if ok else 'ALLOCATES'}")
+    tracemalloc.stop()
+    if failed:
+        print(f"{failed} configurations allocate in the audio callback "
+              f"(peak < {core_limit} B, app peak < {APP_PEAK_LIMIT} B, "
+              f"retained < {args.blocks} B, no snapshot while unchanged)")
+        sys.exit(1)
+    print("No allocations in the steady-state audio callback")
+
+
+if __name__ == '__main__':
+    main()
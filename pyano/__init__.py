@@ -0,0 +1,43 @@
+import importlib
+
+from .synth import Synth, FS, NOTE_KEYS, FREQ_TO_NAME, midi_to_freq
+from .profiler import PROFILER
+
+
+""" --- Package Block ---
+The synth engine without any audio device or keyboard: importing pyano
+loads numpy and the render core only.
+
+    from pyano import Synth
+    synth = Synth()
+    synth.note_on('z')
+    block = synth.render(256)
+
+The subsystems below are imported on first attribute access, so a
+headless render job does not pay for them. sounddevice is imported by
+DeviceProbe's real backend only and pynput by the live front-end
+(app_console.py) only.
+"""
+_LAZY = {
+    'LayerEngine': 'layers',
+    'Recorder': 'recorder',
+    'LookaheadRenderer': 'lookahead',
+    'Governor': 'governor',
+    'ControlSurface': 'controls',
+    'DeviceProbe': 'devices',
+    'FakeBackend': 'devices',
+    'StatusDisplay': 'ui',
+}
+
+__all__ = ['Synth', 'FS', 'NOTE_KEYS', 'FREQ_TO_NAME', 'midi_to_freq',
+           'PROFILER'] + list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module 'pyano' has no attribute {name!r}")
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+# --- END Package Block ---
@@ -0,0 +1,107 @@
+import queue
+import sys
+import threading
+import time
+import traceback
+
+
+""" --- Control Surface Block ---
+Key controls driven by the listener's events instead of a polling loop.
+The listener only queues (control, pressed) pairs; the control thread
+blocks on the queue, so it does not wake up while no key changes.
+Toggles are edge-triggered: an action runs once per press, and the
+OS auto-repeat (repeated presses without a release) is ignored.
+Controls bound with repeat=True run again after REPEAT_DELAY and then
+every REPEAT_INTERVAL while held, timed by the queue wait itself.
+A failing action is reported on stderr and the thread keeps serving;
+should the thread end anyway, done is set so the app does not hang.
+Actions run on the control thread and hand their changes to the audio
+thread as single reference assignments (synth attributes, compiled
+effect schedules).
+"""
+REPEAT_DELAY = 0.3      # seconds held before a repeating control repeats
+REPEAT_INTERVAL = 0.08  # seconds between repeats
+
+
+class ControlSurface(threading.Thread):
+    """
+    bind(control, action, repeat=False): action() runs on the control
+    thread when control is pressed. press() / release() are called from
+    the keyboard listener; done is set by quit() (e.g. bound to esc).
+    """
+
+    def __init__(self, repeat_delay=REPEAT_DELAY,
+                 repeat_interval=REPEAT_INTERVAL):
+        super().__init__(name='controls', daemon=True)
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.bindings = {}  # control -> (action, repeat)
+        self.held = set()   # controls pressed and not yet released
+        self.done = threading.Event()
+        self._events = queue.SimpleQueue()
+
+    def bind(self, control, action, repeat=False):
+        self.bindings[control] = (action, repeat)
+
+    def press(self, control):
+        self._events.put((control, True))
+
+    def release(self, control):
+        self._events.put((control, False))
+
+    def quit(self):
+        self.done.set()
+
+    def stop(self):
+        self._events.put(None)
+
+    def _call(self, action):
+        try:
+            action()
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+    def run(self):
+        try:
+            self._serve()
+        finally:
+            self.done.set()
+
+    def _serve(self):
+        repeating = None  # action of the held repeating control
+        control_held = None
+        next_repeat = None
+        while True:
+            if next_repeat is None:
+                timeout = None
+            else:
+                timeout = max(next_repeat - time.monotonic(), 0.0)
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                event = False  # held long enough: repeat
+            if event is False:
+                self._call(repeating)
+                next_repeat += self.repeat_interval
+                continue
+            if event is None:
+                break
+            control, pressed = event
+            if not pressed:
+                self.held.discard(control)
+                if control == control_held:
+                    repeating = control_held = next_repeat = None
+                continue
+            if control in self.held:
+                continue  # auto-repeat of a held key
+            self.held.add(control)
+            binding = self.bindings.get(control)
+            if binding is None:
+                continue
+            action, repeat = binding
+            self._call(action)
+            if repeat:
+                repeating = action
+                control_held = control
+                next_repeat = time.monotonic() + self.repeat_delay
+# --- END Control Surface Block ---
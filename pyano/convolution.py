@@ -0,0 +1,215 @@
+import math
+import os
+
+import numpy as np
+
+from .effects import SILENCE, block_peak
+from .wavfile import read_wav
+
+
+""" --- Convolution Reverb Block ---
+Uniformly partitioned overlap-save convolution with numpy.fft.
+The impulse response is cut into partitions of one block, their spectra
+are precomputed once (and cached), and every block costs one forward
+FFT, one multiply-accumulate over the frequency-domain delay line and
+one inverse FFT, whatever the IR length. Input goes through a
+one-partition FIFO, so the wet signal always lags by one partition
+and any mix of block lengths gives the same output as whole
+partitions would.
+While the input is silent the reverb bounds what is still to come:
+every stored input partition's level times the energy of the IR tail
+it has yet to meet. Below SILENCE the state is cleared and the effect
+is bypassed until audible input arrives.
+"""
+_SPECTRA_CACHE = {}  # (ir key, partition) -> partition spectra
+
+
+def synthetic_ir(fs, seconds=2.0, seed=0):
+    """ Exponentially decaying noise: a usable room when no IR file is set """
+    n = int(fs * seconds)
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(seed)
+    # -60 dB at the end of the response
+    return rng.standard_normal(n) * np.exp(-6.91 * t / seconds)
+
+
+def load_ir(path, fs):
+    """ Mono IR from a WAV file, resampled to fs if needed """
+    ir_fs, samples = read_wav(path)
+    ir = samples.mean(axis=1)
+    if ir_fs != fs:
+        n = int(round(len(ir) * fs / ir_fs))
+        ir = np.interp(np.arange(n) * ir_fs / fs, np.arange(len(ir)), ir)
+    return ir
+
+
+def ir_spectra(ir, partition, key=None):
+    """
+    Spectra of the IR partitions, shape (partition + 1, partitions):
+    bin-major, with the last partition first to match the delay line.
+    The IR is normalized to unit energy.
+    """
+    cache_key = (key, partition) if key is not None else None
+    if cache_key in _SPECTRA_CACHE:
+        return _SPECTRA_CACHE[cache_key]
+    ir = np.asarray(ir, dtype=float)
+    energy = np.sqrt(np.sum(ir ** 2))
+    if energy > 0:
+        ir = ir / energy
+    count = max(1, -(-len(ir) // partition))
+    parts = np.zeros((count, 2 * partition))
+    parts[:, :partition].flat[:len(ir)] = ir
+    spectra = np.ascontiguousarray(np.fft.rfft(parts, axis=1)[::-1].T)
+    if cache_key is not None:
+        _SPECTRA_CACHE[cache_key] = spectra
+    return spectra
+
+
+class ConvolutionReverb:
+    def __init__(self, fs, ir=None, partition=64, wet=0.35, dry=1.0,
+                 dtype=np.float64):
+        self.fs = fs
+        self.partition = partition
+        self.wet = wet
+        self.dry = dry
+        self.dtype = np.dtype(dtype)
+        self.source = None
+        self.load(ir)
+
+    def load(self, ir=None):
+        """
+        ir: path to a WAV file, a sample array, or None for the
+        synthetic room. Spectra of files are cached by path and mtime.
+        """
+        if ir is None:
+            key = ('synthetic', self.fs)
+            spectra = _SPECTRA_CACHE.get((key, self.partition))
+            if spectra is None:
+                spectra = ir_spectra(synthetic_ir(self.fs), self.partition,
+                                     key)
+        elif isinstance(ir, (str, os.PathLike)):
+            path = os.path.abspath(ir)
+            key = (path, os.path.getmtime(path), self.fs)
+            spectra = _SPECTRA_CACHE.get((key, self.partition))
+            if spectra is None:
+                spectra = ir_spectra(load_ir(path, self.fs), self.partition,
+                                     key)
+        else:
+            spectra = ir_spectra(ir, self.partition)
+        complex_type = np.result_type(self.dtype, np.complex64)
+        self.source = ir
+        self.spectra = spectra.astype(complex_type, copy=False)
+        self.count = spectra.shape[1]
+        self.partitions = self.count  # IR partitions in use (set_length)
+        # Frequency-domain delay line (bin-major), stored twice so the
+        # last `count` input spectra are always one contiguous slice
+        B = self.partition
+        self.fdl = np.zeros((B + 1, 2 * self.count), dtype=complex_type)
+        # L2 level of every input partition, laid out like the delay line
+        self._level = np.zeros(2 * self.count)
+        # Partition energies (Parseval on the 2B-point spectra), summed
+        # into the IR tail each delay line column still has to meet
+        power = np.abs(spectra) ** 2
+        energy = (2 * power.sum(axis=0) - power[0] - power[-1]) / (2 * B)
+        self.tail_gain = np.sqrt(np.cumsum(np.maximum(energy, 0.0)))
+        # The forward FFT runs in float64: NumPy's float32 rfft
+        # allocates a work copy on every call
+        self.input = np.zeros(2 * B)
+        self._in = np.zeros(B, dtype=self.dtype)
+        self._out = np.zeros(B, dtype=self.dtype)
+        # Work buffers for _convolve() and the FIFO
+        self._spectrum = np.zeros(B + 1, dtype=complex)
+        self._acc = np.zeros(B + 1, dtype=complex_type)
+        self._time = np.zeros(2 * B, dtype=self.dtype)
+        self._wet = np.zeros(B, dtype=self.dtype)
+        self.reset()
+
+    def set_length(self, fraction):
+        """
+        Convolve with only the first fraction of the IR: a shorter tail
+        at proportionally lower cost. 1.0 restores the full response.
+        """
+        self.partitions = min(self.count,
+                              max(1, int(round(self.count * fraction))))
+
+    @property
+    def ir_seconds(self):
+        return self.count * self.partition / self.fs
+
+    def reset(self):
+        self.fdl[:] = 0
+        self.fdl_pos = 0
+        self.input[:] = 0
+        self._fill = 0  # input frames waiting for a whole partition
+        self._in[:] = 0
+        self._out[:] = 0
+        self._level[:] = 0
+        self.idle = True  # nothing stored: process() only applies dry
+
+    def _convolve(self, x):
+        """ Wet output for one partition of input (overlap-save) """
+        B = self.partition
+        self.input[:B] = self.input[B:]
+        self.input[B:] = x
+        spectrum = np.fft.rfft(self.input, out=self._spectrum)
+        p = self.fdl_pos
+        self.fdl[:, p] = spectrum
+        self.fdl[:, p + self.count] = spectrum
+        level = math.sqrt(float(np.dot(x, x)))
+        self._level[p] = level
+        self._level[p + self.count] = level
+        # The newest spectra meet the first IR partitions (last columns)
+        skip = self.count - self.partitions
+        window = self.fdl[:, p + 1 + skip:p + 1 + self.count]
+        acc = np.einsum('kp,kp->k', window, self.spectra[:, skip:],
+                        out=self._acc)
+        self.fdl_pos = (p + 1) % self.count
+        return np.fft.irfft(acc, 2 * B, out=self._time)[B:]
+
+    def tail_level(self):
+        """
+        Upper bound on any future wet sample from the input stored so
+        far (Cauchy-Schwarz per partition, before the wet gain)
+        """
+        p = self.fdl_pos
+        return float(np.dot(self._level[p:p + self.count], self.tail_gain))
+
+    def process(self, signal):
+        """ In place: dry * x + wet * (x convolved with the IR) """
+        quiet = block_peak(signal) < SILENCE
+        if quiet and self.idle:
+            if self.dry != 1.0:
+                signal *= self.dry
+            return signal
+        self.idle = False
+        self._mix(signal)
+        if quiet:
+            # FIFO: input not yet convolved and wet not yet played
+            pending = self._in[:self._fill]
+            bound = self.tail_level() + math.sqrt(float(np.dot(
+                pending, pending))) + block_peak(self._out)
+            if bound * self.wet < SILENCE:
+                self.reset()
+        return signal
+
+    def _mix(self, signal):
+        """ process() without the silence bypass """
+        B = self.partition
+        frames = len(signal)
+        # Each sample plays the wet output of the previous partition
+        pos = 0
+        while pos < frames:
+            n = min(B - self._fill, frames - pos)
+            chunk = signal[pos:pos + n]
+            self._in[self._fill:self._fill + n] = chunk
+            chunk *= self.dry
+            wet = np.multiply(self._out[self._fill:self._fill + n], self.wet,
+                              out=self._wet[:n])
+            chunk += wet
+            self._fill += n
+            if self._fill == B:
+                self._out[:] = self._convolve(self._in)
+                self._fill = 0
+            pos += n
+        return signal
+# --- END Convolution Reverb Block ---
@@ -0,0 +1,313 @@
+import json
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .telemetry import status_bits, XRUN_MASK
+
+
+""" --- Device Probe Block ---
+Finds out once what an output device can do and remembers it.
+The host APIs and devices are enumerated a single time per probe; for
+a device the probe checks which SAMPLE_RATES it accepts, then opens a
+stream at every size in BLOCKSIZES (smallest first) for PROBE_SECONDS
+and measures the latency the host reports (input + output when the
+device also records, i.e. the round trip), xruns, the callback's
+wake-up jitter and its load with an optional work(out) function (e.g.
+a synth rendering a chord), both as 99th percentiles. The smallest
+size without xruns and with MIN_HEADROOM of the block left is the
+device's blocksize.
+Results are stored in a JSON cache keyed by host API and device name
+(indexes change between boots), so later startups skip the probing.
+The probe talks to a backend object: SoundDeviceBackend for real
+hardware, FakeBackend for running it without any.
+"""
+DEVICE_CACHE = 'device_cache.json'
+SAMPLE_RATES = (44100, 48000, 88200, 96000)
+BLOCKSIZES = (32, 64, 128, 256, 512)
+PROBE_SECONDS = 0.5  # per blocksize
+MIN_HEADROOM = 0.3   # share of the block period left after the callback
+MAX_JITTER = 0.5     # callback interval deviation, share of the period
+PROBE_VERSION = 1    # cache entries of another version are re-probed
+
+
+class DeviceInfo(NamedTuple):
+    index: int
+    name: str
+    hostapi: str
+    outputs: int
+    inputs: int
+    default_samplerate: float
+
+    @property
+    def key(self):
+        """ Stable identity for the cache """
+        return f"{self.hostapi}|{self.name}|{self.outputs}|{self.inputs}"
+
+
+class SoundDeviceBackend:
+    """ sounddevice / PortAudio, imported on first use """
+
+    def __init__(self):
+        import sounddevice
+        self.sd = sounddevice
+
+    def hostapis(self):
+        return [api['name'] for api in self.sd.query_hostapis()]
+
+    def default_output(self):
+        return self.sd.query_devices(kind='output')['index']
+
+    def devices(self):
+        return [dict(dev) for dev in self.sd.query_devices()]
+
+    def supports(self, device, samplerate):
+        try:
+            self.sd.check_output_settings(device=device, channels=1,
+                                          samplerate=samplerate,
+                                          dtype='float32')
+        except Exception:
+            return False
+        return True
+
+    def measure(self, device, samplerate, blocksize, seconds, work=None):
+        """ Run a stream; (latency, xruns, callback starts, durations) """
+        info = self.sd.query_devices(device)
+        duplex = info['max_input_channels'] > 0
+        blocks = int(seconds * samplerate / blocksize) + 16
+        starts = np.zeros(blocks)
+        durations = np.zeros(blocks)
+        state = [0, 0]  # callbacks, xruns
+
+        def callback(*args):
+            start = time.perf_counter()
+            # (indata, outdata, ...) for duplex streams
+            outdata = args[1] if duplex else args[0]
+            status = args[-1]
+            if status_bits(status) & XRUN_MASK:
+                state[1] += 1
+            if work is None:
+                outdata.fill(0.0)
+            else:
+                work(outdata[:, 0])
+                outdata[:, 0] *= 0.0  # measure the work, play silence
+            n = state[0]
+            if n < blocks:
+                starts[n] = start
+                durations[n] = time.perf_counter() - start
+            state[0] = n + 1
+
+        if duplex:
+            stream = self.sd.Stream(device=device, samplerate=samplerate,
+                                    blocksize=blocksize, channels=(1, 1),
+                                    dtype='float32', latency='low',
+                                    callback=callback)
+        else:
+            stream = self.sd.OutputStream(device=device,
+                                          samplerate=samplerate,
+                                          blocksize=blocksize, channels=1,
+                                          dtype='float32', latency='low',
+                                          callback=callback)
+        with stream:
+            time.sleep(seconds)
+            latency = stream.latency
+        if duplex:
+            latency = sum(latency)
+        n = min(state[0], blocks)
+        return latency, state[1], starts[:n], durations[:n]
+
+
+class FakeBackend:
+    """
+    Scripted devices for running the probe without hardware. Blocks
+    smaller than min_blocksize count xruns; the latency is base_latency
+    plus two blocks. A work function still runs for real, so its load
+    is measured.
+    """
+
+    def __init__(self, devices=None, rates=(44100, 48000),
+                 min_blocksize=64, base_latency=0.003):
+        self._hostapis = ['Fake API']
+        self._devices = devices if devices is not None else [
+            {'name': 'Fake Output', 'hostapi': 0, 'max_output_channels': 2,
+             'max_input_channels': 0, 'default_samplerate': 48000.0},
+            {'name': 'Fake Duplex', 'hostapi': 0, 'max_output_channels': 2,
+             'max_input_channels': 2, 'default_samplerate': 48000.0},
+        ]
+        self.rates = rates
+        self.min_blocksize = min_blocksize
+        self.base_latency = base_latency
+        self.streams = 0  # measure() calls, i.e. streams "opened"
+
+    def hostapis(self):
+        return list(self._hostapis)
+
+    def default_output(self):
+        return 0
+
+    def devices(self):
+        return [dict(dev) for dev in self._devices]
+
+    def supports(self, device, samplerate):
+        return samplerate in self.rates
+
+    def measure(self, device, samplerate, blocksize, seconds, work=None):
+        self.streams += 1
+        blocks = max(int(seconds * samplerate / blocksize), 2)
+        period = blocksize / samplerate
+        starts = np.arange(blocks) * period
+        durations = np.zeros(blocks)
+        if work is not None:
+            out = np.zeros(blocksize, dtype=np.float32)
+            for i in range(blocks):
+                start = time.perf_counter()
+                work(out)
+                durations[i] = time.perf_counter() - start
+        xruns = blocks // 10 if blocksize < self.min_blocksize else 0
+        latency = self.base_latency + 2 * period
+        return latency, xruns, starts, durations
+
+
+def block_stats(samplerate, blocksize, latency, xruns, starts, durations):
+    """ Cache entry for one measured blocksize """
+    period = blocksize / samplerate
+    # 99th percentiles: one slow first callback is not the steady state
+    load = float(np.percentile(durations, 99)) / period \
+        if len(durations) else 0.0
+    if len(starts) > 2:
+        jitter = float(np.percentile(np.abs(np.diff(starts[1:]) - period),
+                                     99)) / period
+    else:
+        jitter = 0.0
+    headroom = 1.0 - load
+    return {
+        'latency': float(latency),
+        'xruns': int(xruns),
+        'load': load,
+        'jitter': jitter,
+        'headroom': headroom,
+        'stable': (xruns == 0 and headroom >= MIN_HEADROOM and
+                   jitter <= MAX_JITTER),
+    }
+
+
+class DeviceProbe:
+    """
+    probe(device, samplerate) -> cache entry, measured on a miss:
+    {'samplerates': [...], 'blocks': {size: block_stats()},
+     'blocksize': smallest stable size or None, ...}
+    """
+
+    def __init__(self, backend=None, cache_path=DEVICE_CACHE,
+                 seconds=PROBE_SECONDS, blocksizes=BLOCKSIZES):
+        self.backend = backend if backend is not None else \
+            SoundDeviceBackend()
+        self.cache_path = cache_path
+        self.seconds = seconds
+        self.blocksizes = blocksizes
+        self._hostapis = None
+        self._devices = None
+        self.cache = self._load()
+
+    def hostapis(self):
+        """ Host API names, enumerated once """
+        if self._hostapis is None:
+            self._hostapis = self.backend.hostapis()
+        return self._hostapis
+
+    def devices(self):
+        """ All devices, enumerated once """
+        if self._devices is None:
+            apis = self.hostapis()
+            self._devices = [
+                DeviceInfo(i, dev['name'], apis[dev['hostapi']],
+                           dev['max_output_channels'],
+                           dev['max_input_channels'],
+                           dev['default_samplerate'])
+                for i, dev in enumerate(self.backend.devices())]
+        return self._devices
+
+    def outputs(self, hostapi=None):
+        """
+        Output devices, optionally only those of the host APIs whose
+        name starts with hostapi (case-insensitive)
+        """
+        return [dev for dev in self.devices() if dev.outputs > 0 and
+                (hostapi is None or
+                 dev.hostapi.lower().startswith(hostapi.lower()))]
+
+    def device(self, index=None):
+        """ Device by index; None is the default output """
+        if index is None:
+            index = self.backend.default_output()
+        return self.devices()[index]
+
+    def samplerates(self, device):
+        """ SAMPLE_RATES the device accepts (no stream is opened) """
+        return [rate for rate in SAMPLE_RATES
+                if self.backend.supports(device.index, rate)]
+
+    def cached(self, device, samplerate):
+        entry = self.cache.get(device.key, {}).get(str(samplerate))
+        if entry is None or entry.get('version') != PROBE_VERSION:
+            return None
+        return entry
+
+    def probe(self, device, samplerate, work=None, force=False):
+        """ device: DeviceInfo, index or None (default output) """
+        if not isinstance(device, DeviceInfo):
+            device = self.device(device)
+        entry = None if force else self.cached(device, samplerate)
+        if entry is not None:
+            return entry
+        backend = self.backend
+        rates = self.samplerates(device)
+        blocks = {}
+        blocksize = None
+        if samplerate in rates or backend.supports(device.index,
+                                                   samplerate):
+            for size in self.blocksizes:
+                stats = block_stats(samplerate, size, *backend.measure(
+                    device.index, samplerate, size, self.seconds, work))
+                blocks[str(size)] = stats
+                if stats['stable']:
+                    # Larger blocks only add latency
+                    blocksize = size
+                    break
+        entry = {
+            'version': PROBE_VERSION,
+            'device': device.name,
+            'hostapi': device.hostapi,
+            'samplerates': rates,
+            'blocks': blocks,
+            'blocksize': blocksize,
+            'probed': time.time(),
+        }
+        self.cache.setdefault(device.key, {})[str(samplerate)] = entry
+        self._save()
+        return entry
+
+    def blocksize(self, device, samplerate, default=64, work=None):
+        """ Smallest stable blocksize of device (probed once), or default """
+        size = self.probe(device, samplerate, work)['blocksize']
+        return default if size is None else size
+
+    def _load(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}  # unreadable cache: probe again
+
+    def _save(self):
+        if self.cache_path is None:
+            return
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.cache, f, indent=1)
+        os.replace(tmp, self.cache_path)
+# --- END Device Probe Block ---
@@ -0,0 +1,243 @@
+import numpy as np
+
+
+MAX_BLOCK = 1024  # largest block the effect buffers are sized for
+SILENCE_DB = -90.0  # effects bypass once their tail falls below this
+SILENCE = 10 ** (SILENCE_DB / 20)
+
+
+def block_peak(block):
+    """ Peak absolute sample without allocating a temporary """
+    if len(block) == 0:
+        return 0.0
+    return max(float(block.max()), -float(block.min()))
+
+
+""" --- Delay Line Block ---
+Ring buffer with block reads and writes; a wraparound is split into two
+slices, so a block costs a few NumPy copies instead of a Python loop
+per sample. Delay time can change at runtime up to max_delay_sec.
+process() tracks how long only silence has been written: once the
+last delay's worth of the line is below SILENCE and so is the input,
+the line is cleared and bypassed until audible input arrives.
+"""
+
+
+class DelayLine:
+    def __init__(self, fs, max_delay_sec, delay_sec=None, feedback=0.0,
+                 wet=1.0, dry=1.0, max_block=MAX_BLOCK, dtype=np.float64):
+        self.fs = fs
+        self.delay_sec = max_delay_sec if delay_sec is None else delay_sec
+        self.feedback = feedback
+        self.wet = wet
+        self.dry = dry
+        self.max_block = max_block
+        self.max_delay = max(1, int(round(fs * max_delay_sec)))
+        self.size = self.max_delay + max_block
+        self.buffer = np.zeros(self.size, dtype=dtype)
+        self.idx = 0  # next write position
+        # Work buffers for process()
+        self._tap = np.zeros(max_block, dtype=dtype)
+        self._feed = np.zeros(max_block, dtype=dtype)
+        self.idle = True  # line holds only silence: process() is a no-op
+        self.quiet = 0    # samples written since the last audible one
+
+    def reset(self):
+        self.buffer[:] = 0
+        self.idx = 0
+        self.idle = True
+        self.quiet = 0
+
+    def delay_samples(self):
+        return min(max(1, int(round(self.delay_sec * self.fs))),
+                   self.max_delay)
+
+    def read(self, frames, delay, out=None):
+        """ The frames samples written delay samples before idx """
+        if out is None:
+            out = np.empty(frames, dtype=self.buffer.dtype)
+        start = (self.idx - delay) % self.size
+        end = start + frames
+        if end <= self.size:
+            out[:] = self.buffer[start:end]
+        else:
+            split = self.size - start
+            out[:split] = self.buffer[start:]
+            out[split:] = self.buffer[:end - self.size]
+        return out
+
+    def write(self, block):
+        frames = len(block)
+        end = self.idx + frames
+        if end <= self.size:
+            self.buffer[self.idx:end] = block
+        else:
+            split = self.size - self.idx
+            self.buffer[self.idx:] = block[:split]
+            self.buffer[:end - self.size] = block[split:]
+        self.idx = end % self.size
+
+    def process(self, signal):
+        """
+        In place: out = dry * x + wet * delayed; the line is fed with
+        out + feedback * delayed. A block longer than the delay is
+        handled in delay-sized chunks so feedback stays exact.
+        """
+        loud = block_peak(signal) >= SILENCE
+        if self.idle and not loud:
+            return signal
+        self.idle = False
+        delay = self.delay_samples()
+        step = min(delay, self.max_block)
+        frames = len(signal)
+        pos = 0
+        while pos < frames:
+            n = min(step, frames - pos)
+            block = signal[pos:pos + n]
+            delayed = self.read(n, delay, self._tap[:n])
+            if self.dry != 1.0:
+                block *= self.dry
+            if self.feedback:
+                feed = self._feed[:n]
+                np.multiply(delayed, self.feedback, out=feed)
+            delayed *= self.wet
+            block += delayed
+            written = block
+            if self.feedback:
+                feed += block
+                written = feed
+            self.write(written)
+            loud = loud or block_peak(written) >= SILENCE
+            pos += n
+        # Tail tracking: bypass once a whole delay of silence is stored
+        self.quiet = 0 if loud else self.quiet + frames
+        if self.quiet >= delay:
+            self.reset()
+        return signal
+# --- END Delay Line Block ---
+
+
+""" --- Chorus Effect Block ---
+Modulated delay taps read from a ring buffer with linear interpolation.
+All voices' read positions for a block are computed as one array and
+gathered at once; every voice keeps its own continuous LFO phase.
+Feed-forward, so once the whole line is silent the effect is bypassed
+until audible input arrives.
+"""
+
+
+class Chorus:
+    def __init__(self, fs, depth=0.008, rate=1.1, voices=4, mix=0.28,
+                 max_voices=8, max_depth=0.0125, max_block=MAX_BLOCK,
+                 dtype=np.float64):
+        self.fs = fs
+        self.depth = depth      # seconds of delay modulation
+        self.rate = rate        # Hz, voice v runs at rate + v * 0.25
+        self.voices = voices
+        self.mix = mix
+        self.max_voices = max_voices
+        self.max_depth = max_depth
+        self.max_block = max_block
+        self.min_delay = 0.001  # seconds, shortest tap
+        # Room for the longest tap behind the oldest sample of a block
+        self.line = DelayLine(fs, self.min_delay + 2 * max_depth + 2 / fs,
+                              max_block=max_block, dtype=dtype)
+        # (rate, phase) of each LFO; spread the phases so the voices
+        # do not move together
+        self._lfo = np.zeros((max_voices, 2), dtype=dtype)
+        self.lfo_phase = self._lfo[:, 1]
+        self.lfo_phase[:] = np.arange(max_voices) / max_voices
+        self._spread = 0.25 * np.arange(max_voices, dtype=dtype)
+        # Work buffers for a block of every voice; per-voice values are
+        # spread over the block by a matmul with the (ramp, ones) basis
+        self._basis = np.ones((2, max_block), dtype=dtype)
+        self._basis[0] = np.arange(max_block)
+        self._at = np.ones((max_voices, 2), dtype=dtype)   # (1, start)
+        self._weights = np.zeros((1, max_voices), dtype=dtype)
+        self._row = np.zeros(max_block, dtype=dtype)
+        self._pos = np.zeros(max_voices * max_block, dtype=dtype)
+        self._base = np.zeros(max_voices * max_block, dtype=dtype)
+        self._taps = np.zeros(max_voices * max_block, dtype=dtype)
+        self._i0 = np.zeros(max_voices * max_block, dtype=np.intp)
+        self._i1 = np.zeros(max_voices * max_block, dtype=np.intp)
+
+    @property
+    def idle(self):
+        return self.line.idle
+
+    def reset(self):
+        self.line.reset()
+
+    def process(self, signal):
+        """ Adds the chorus to signal in place """
+        frames = len(signal)
+        voices = min(self.voices, self.max_voices)
+        if voices <= 0:
+            return signal
+        if frames > self.max_block:
+            for start in range(0, frames, self.max_block):
+                self.process(signal[start:start + self.max_block])
+            return signal
+        line = self.line
+        if block_peak(signal) < SILENCE:
+            if line.idle:
+                return signal
+            # Taps reach back at most one line: bypass after that
+            line.quiet += frames
+            if line.quiet >= line.size:
+                line.reset()
+                return signal
+        else:
+            line.quiet = 0
+            line.idle = False
+        start = line.idx
+        line.write(signal)
+        size = voices * frames
+        pos = self._pos[:size].reshape(voices, frames)
+        base = self._base[:size].reshape(voices, frames)
+        taps = self._taps[:size].reshape(voices, frames)
+        i0 = self._i0[:size].reshape(voices, frames)
+        i1 = self._i1[:size].reshape(voices, frames)
+        basis = self._basis[:, :frames]
+        row = self._row[:frames]
+
+        # Continuous LFO per voice, advanced by the block length
+        lfo = self._lfo[:voices]
+        rates = lfo[:, 0]
+        np.add(self._spread[:voices], self.rate, out=rates)
+        rates /= self.fs
+        np.matmul(lfo, basis, out=pos)
+        lfo_phase = lfo[:, 1]
+        np.add(pos[:, -1], rates, out=lfo_phase)
+        np.mod(lfo_phase, 1.0, out=lfo_phase)
+
+        # Delay in samples: min_delay + depth * (1 + sin), never below 1
+        depth = min(self.depth, self.max_depth) * self.fs
+        pos *= 2 * np.pi
+        np.sin(pos, out=pos)
+        pos += 1.0
+        pos *= depth
+        pos += self.min_delay * self.fs
+        # Read position behind the write position of each frame
+        at = self._at[:voices]
+        at[:, 1] = start
+        np.matmul(at, basis, out=base)
+        np.subtract(base, pos, out=pos)
+        np.floor(pos, out=base)
+        pos -= base
+        np.copyto(i0, base, casting='unsafe')
+        np.mod(i0, line.size, out=i0)
+        np.add(i0, 1, out=i1)
+        np.mod(i1, line.size, out=i1)
+        np.take(line.buffer, i0, out=taps, mode='clip')
+        hi = np.take(line.buffer, i1, out=base, mode='clip')
+        hi -= taps
+        hi *= pos
+        taps += hi
+        # Mix the voices (mix / voices each) with one matmul
+        weights = self._weights[:, :voices]
+        weights.fill(self.mix / voices)
+        np.matmul(weights, taps, out=row[None, :])
+        signal += row
+        return signal
+# --- END Chorus Effect Block ---
@@ -0,0 +1,138 @@
+import numpy as np
+
+
+""" --- ADSR Envelope Block ---
+Attack, Decay, Sustain, Release times (seconds) and sustain level.
+These are the defaults: every VoicePool keeps its own copy (its adsr
+attribute), so layers can have different envelopes.
+"""
+ADSR = {
+    'attack': 0.05,   # fast attack
+    'decay': 0.1,     # fast decay
+    'sustain': 0.7,   # sustain level
+    'release': 0.2    # slow release
+}
+
+# Envelope segments (stage index of a voice)
+IDLE = 0
+ATTACK = 1
+DECAY = 2
+SUSTAIN = 3
+RELEASE = 4
+
+_EPS = 1e-9  # absorbs rounding at segment ends
+# --- END ADSR Envelope Block ---
+
+
+class EnvelopeScratch:
+    """
+    Work arrays for render_envelopes, allocated once for up to capacity
+    voices and max_block frames so the audio thread allocates nothing.
+    Per-voice ramps are (start, slope) rows multiplied with the
+    (ones, k) basis: a matmul fills a whole (voices, frames) block
+    without a broadcasting ufunc, which would allocate iterator buffers.
+    """
+    __slots__ = ('basis', 'tmp', 'fall', 'rise', 'floor', 'work',
+                 'attacking', 'decaying', 'releasing', 'idle', 'cond',
+                 'new_stage', 'eps')
+
+    def __init__(self, capacity, max_block, dtype=np.float64):
+        self.basis = np.ones((2, max_block), dtype=dtype)
+        self.basis[1] = np.arange(1, max_block + 1)  # k = 1 ... n
+        self.tmp = np.empty(capacity * max_block, dtype=dtype)
+        self.fall = np.zeros((capacity, 2), dtype=dtype)   # down0, -slope
+        self.rise = np.zeros((capacity, 2), dtype=dtype)   # up0, attack
+        self.floor = np.zeros((capacity, 2), dtype=dtype)  # floor, 0
+        self.work = np.empty(capacity, dtype=dtype)
+        self.attacking = np.empty(capacity, dtype=bool)
+        self.decaying = np.empty(capacity, dtype=bool)
+        self.releasing = np.empty(capacity, dtype=bool)
+        self.idle = np.empty(capacity, dtype=bool)
+        self.cond = np.empty(capacity, dtype=bool)
+        self.new_stage = np.empty(capacity, dtype=np.int8)
+        # Segment-end snapping must survive float32 rounding
+        self.eps = max(_EPS, 4 * float(np.finfo(dtype).eps))
+
+
+def render_envelopes(stage, level, release_step, out, fs, scratch=None,
+                     adsr=ADSR):
+    """
+    Vectorized ADSR for many voices at once.
+    stage, level, release_step: per-voice state arrays (updated in place)
+    out: (voices, frames) contiguous array, filled in place
+    scratch: EnvelopeScratch of out's dtype; without it the work
+    arrays are allocated for this call.
+    adsr: envelope times and sustain level, see ADSR
+    Every segment is linear, so a whole block is a clipped ramp per
+    voice: min(up0 + attack ramp, max(down0 - slope * k, floor)).
+    Gated voices fall along the decay slope to the sustain level,
+    released voices along their release slope to zero.
+    """
+    voices, frames = out.shape
+    if scratch is None:
+        scratch = EnvelopeScratch(voices, frames, out.dtype)
+    sustain = adsr['sustain']
+    attack_step = 1.0 / max(adsr['attack'] * fs, 1.0)
+    decay_step = (1.0 - sustain) / max(adsr['decay'] * fs, 1.0)
+    eps = scratch.eps
+    basis = scratch.basis[:, :frames]
+
+    attacking = np.equal(stage, ATTACK, out=scratch.attacking[:voices])
+    decaying = np.equal(stage, DECAY, out=scratch.decaying[:voices])
+    releasing = np.equal(stage, RELEASE, out=scratch.releasing[:voices])
+    idle = np.equal(stage, IDLE, out=scratch.idle[:voices])
+    cond = scratch.cond[:voices]
+    work = scratch.work[:voices]
+
+    # Starting points, slopes and floors of the ramps
+    rise = scratch.rise[:voices]
+    up0 = rise[:, 0]
+    up0.fill(2.0)  # above any level: no attack limit
+    np.copyto(up0, level, where=attacking)
+    rise[:, 1] = attack_step
+    fall = scratch.fall[:voices]
+    down0 = fall[:, 0]
+    down0.fill(sustain)
+    np.subtract(1.0, level, out=work)
+    work *= decay_step / attack_step
+    work += 1.0
+    np.copyto(down0, work, where=attacking)
+    np.copyto(down0, level, where=decaying)
+    np.copyto(down0, level, where=releasing)
+    slope = fall[:, 1]
+    slope.fill(-decay_step)
+    np.negative(release_step, out=work)
+    np.copyto(slope, work, where=releasing)
+    floor = scratch.floor[:voices]
+    floor[:, 0] = sustain
+    np.copyto(floor[:, 0], 0.0, where=releasing)
+    for param in (down0, slope, floor[:, 0]):
+        np.copyto(param, 0.0, where=idle)
+
+    tmp = scratch.tmp[:voices * frames].reshape(voices, frames)
+    np.matmul(fall, basis, out=out)
+    np.matmul(floor, basis, out=tmp)
+    np.maximum(out, tmp, out=out)
+    np.matmul(rise, basis, out=tmp)
+    np.minimum(out, tmp, out=out)
+
+    # Advance the segment state to the end of the block
+    last = out[:, -1]
+    new_stage = scratch.new_stage[:voices]
+    new_stage.fill(SUSTAIN)
+    np.greater(last, sustain + eps, out=cond)
+    np.copyto(new_stage, DECAY, where=cond)
+    np.add(up0, attack_step * frames, out=work)
+    np.less(work, 1.0 - eps, out=cond)
+    cond &= attacking
+    np.copyto(new_stage, ATTACK, where=cond)
+    np.copyto(new_stage, IDLE, where=releasing)
+    np.greater(last, eps, out=cond)
+    cond &= releasing
+    np.copyto(new_stage, RELEASE, where=cond)
+    np.copyto(new_stage, IDLE, where=idle)
+    stage[:] = new_stage
+    np.copyto(level, last)
+    np.equal(stage, IDLE, out=cond)
+    np.copyto(level, 0.0, where=cond)
+    return out
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+
+""" --- Note Event Queue Block ---
+Bounded single-producer / single-consumer ring of timestamped key
+events. The keyboard listener pushes, the audio callback pops; the
+storage is preallocated and each side only moves its own index, so
+neither side takes a lock or allocates storage.
+"""
+
+
+class EventQueue:
+    __slots__ = ('capacity', 'times', 'keys', 'on', 'head', 'tail',
+                 'dropped')
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)           # time.monotonic() stamps
+        self.keys = np.zeros(capacity, dtype=np.int32)
+        self.on = np.zeros(capacity, dtype=bool)
+        self.head = 0     # next slot to write (producer only)
+        self.tail = 0     # next slot to read (consumer only)
+        self.dropped = 0  # events lost because the ring was full
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, when, key, on):
+        """ Producer side. Returns False (and counts a drop) when full """
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = head % self.capacity
+        self.times[slot] = when
+        self.keys[slot] = key
+        self.on[slot] = on
+        # Publish only after the slot is fully written
+        self.head = head + 1
+        return True
+
+    def pop_due(self, deadline, out):
+        """
+        Consumer side: move every event stamped before deadline into out
+        as (time, key, on). Later events stay queued for the next block.
+        """
+        tail = self.tail
+        head = self.head
+        while tail < head:
+            slot = tail % self.capacity
+            when = self.times[slot]
+            if when >= deadline:
+                break
+            out.append((float(when), int(self.keys[slot]),
+                        bool(self.on[slot])))
+            tail += 1
+        self.tail = tail
+        return out
+
+
+class BlockClock:
+    """
+    Maps monotonic event timestamps to sample offsets inside the block
+    being rendered. The stream clock from the callback's time_info is
+    tied to time.monotonic() with a smoothed offset, and every event is
+    delayed by the same amount (output latency + one block), so onsets
+    land at their true relative position instead of the block start.
+    extra_delay: seconds added to that delay for audio buffered between
+    the renderer and the callback (the lookahead ring)
+    """
+    __slots__ = ('fs', 'extra_delay', 'clock_offset', 'delay', 'dac_time',
+                 'block_start')
+
+    def __init__(self, fs, extra_delay=0.0):
+        self.fs = fs
+        self.extra_delay = extra_delay
+        self.clock_offset = None  # monotonic - stream time
+        self.delay = None         # constant key-to-sound scheduling delay
+        self.dac_time = 0.0       # monotonic time the block is heard
+        self.block_start = 0.0    # monotonic time mapped to sample 0
+
+    def start_block(self, frames, time_info=None, now=None):
+        """ Call at the top of the callback; returns the due deadline """
+        now = time.monotonic() if now is None else now
+        current = getattr(time_info, 'currentTime', 0.0) or 0.0
+        dac = getattr(time_info, 'outputBufferDacTime', 0.0) or 0.0
+        if current and dac:
+            offset = now - current
+            if self.clock_offset is None:
+                self.clock_offset = offset
+            else:
+                # Smooth out the callback's wake-up jitter
+                self.clock_offset += 0.01 * (offset - self.clock_offset)
+            dac_time = dac + self.clock_offset
+        else:
+            # Host API without timing info: the block plays "now"
+            dac_time = now
+        self.dac_time = dac_time
+        block_duration = frames / self.fs
+        if self.delay is None:
+            self.delay = max(dac_time - now, 0.0) + block_duration + \
+                self.extra_delay
+        self.block_start = dac_time - self.delay
+        return self.block_start + block_duration
+
+    def sample_offset(self, when, frames):
+        offset = int((when - self.block_start) * self.fs)
+        return min(max(offset, 0), frames - 1)
+# --- END Note Event Queue Block ---
@@ -0,0 +1,222 @@
+import math
+
+import numpy as np
+
+
+""" --- Voice Filter Block ---
+Resonant low-pass per voice (the state-variable / TPT design, i.e. the
+bilinear transform of 1 / (s^2 + s/Q + 1)), for all sounding voices at
+once with no loop over voices or samples.
+The block is cut into SUB_BLOCK pieces with coefficients held per
+piece (the cutoff follows the envelope at that rate). Within a piece
+the biquad is linear and time-invariant, so its output is
+    y = H x + s1 g + s2 g[t-1]
+with H the lower-triangular Toeplitz matrix of the impulse response h
+and g the all-pole response that carries the transposed direct form
+state (s1, s2) in. Both have closed forms in the pole radius r and
+angle theta (filter_responses), so a piece is one gather that builds
+every voice's [H | g | g[t-1]] matrix and one batched matmul.
+Envelope-driven cutoffs read their responses from a table over a
+STEPS_PER_OCTAVE grid, rebuilt when the resonance changes; a fixed
+cutoff uses one exact matrix shared by all voices.
+"""
+SUB_BLOCK = 32           # frames per coefficient update
+MIN_CUTOFF = 20.0        # Hz
+MAX_CUTOFF_RATIO = 0.45  # of the sample rate
+STEPS_PER_OCTAVE = 48    # cutoff grid of the modulated path (25 cents)
+MIN_Q = 0.7071           # no resonance peak (Butterworth)
+MAX_Q = 20.0             # resonance = 1.0
+WIDTH = SUB_BLOCK + 2    # response samples, t = -1 ... SUB_BLOCK
+
+
+def filter_responses(fs, cutoffs, resonance):
+    """
+    Responses over t = -1 ... SUB_BLOCK for an array of cutoffs:
+    rows (cutoffs, 2 * WIDTH) holding [h, g], and b0, a2 of the biquad
+    b = b0 (1, 2, 1), a = (1, a1, a2). Q stays above 1/sqrt(2), so the
+    poles r e^(+-i theta) are complex:
+        g[t] = r^t sin((t + 1) theta) / sin(theta)
+        h[t] = K r^(t - 2) sin((t - 1) theta + 2 psi),  t >= 1
+    with psi = arg(1 + r e^(i theta)) and K = 4 g^2 / (D^2 sin(theta)).
+    """
+    q = MIN_Q * (MAX_Q / MIN_Q) ** min(max(resonance, 0.0), 1.0)
+    fc = np.clip(np.asarray(cutoffs, dtype=float), MIN_CUTOFF,
+                 MAX_CUTOFF_RATIO * fs)
+    g = np.tan(np.pi * fc / fs)[:, None]
+    D = 1 + g / q + g * g
+    b0 = g * g / D
+    a2 = (1 - g / q + g * g) / D
+    # D r e^(i theta) = (1 - g^2) + i g sqrt(4 - 1/Q^2)
+    im = g * np.sqrt(4 - 1 / q ** 2)
+    theta = np.arctan2(im, 1 - g * g)
+    psi = np.arctan2(im, 2 + g / q)
+    log_r = 0.5 * np.log(a2)
+    sin_theta = im / (D * np.exp(log_r))
+    t = np.arange(-1, SUB_BLOCK + 1)
+    all_pole = np.exp(t * log_r) * np.sin((t + 1) * theta) / sin_theta
+    all_pole[:, 0] = 0.0  # exactly: fills the upper triangle of H
+    K = 4 * g * g / (D * D * sin_theta)
+    impulse = K * np.exp((t - 2) * log_r) * np.sin((t - 1) * theta +
+                                                   2 * psi)
+    impulse[:, 1] = b0[:, 0]  # h[0]: the closed form starts at t = 1
+    return (np.concatenate([impulse, all_pole], axis=1), b0[:, 0],
+            a2[:, 0])
+
+
+def _gather_index(L, voices):
+    """
+    Flat indices of the (L + 1, L + 2) matrices [H | g | g[t-1]] of
+    every voice into its [h, g] response row
+    """
+    t = np.arange(L + 1)[:, None]
+    j = np.arange(L)[None, :]
+    h = np.where(t >= j, t - j + 1, WIDTH)
+    row = np.concatenate([h, t + 1 + WIDTH, t + WIDTH], axis=1)
+    return (np.arange(voices)[:, None] * 2 * WIDTH + row.ravel()).ravel()
+
+
+class VoiceFilter:
+    """
+    cutoff: Hz; resonance: 0.0 ... 1.0 (Q from MIN_Q to MAX_Q);
+    env_amount: octaves the cutoff rises at full envelope level.
+    state is indexed by voice slot: VoicePool moves and clears it with
+    the voices.
+    """
+    __slots__ = ('fs', 'capacity', 'cutoff', 'resonance', 'env_amount',
+                 'state', '_steps', '_index', '_shared', '_shared_key',
+                 '_shared_coef', '_table', '_table_key', '_table_b0',
+                 '_table_a2', '_grid', '_steps_buf', '_rows', '_coef',
+                 '_matrix', '_vector', '_y')
+
+    def __init__(self, fs, capacity, cutoff=2000.0, resonance=0.3,
+                 env_amount=0.0):
+        self.fs = fs
+        self.capacity = capacity
+        self.cutoff = cutoff
+        self.resonance = resonance
+        self.env_amount = env_amount
+        S = SUB_BLOCK
+        # Transposed direct form II state (s1, s2) of every voice
+        self.state = np.zeros((capacity, 2))
+        self._index = {}          # piece length -> gather index
+        # Fixed cutoff: piece length -> shared matrix^T, (b0, a2)
+        self._shared = {}
+        self._shared_key = None
+        self._shared_coef = (0.0, 0.0)
+        # Modulated cutoff: responses over the cutoff grid
+        self._steps = int(np.ceil(np.log2(MAX_CUTOFF_RATIO * fs /
+                                          MIN_CUTOFF) * STEPS_PER_OCTAVE))
+        self._table = None
+        self._table_key = None
+        self._table_b0 = None
+        self._table_a2 = None
+        # Work buffers: grid step per voice, gathered rows, b0 / a2 /
+        # scratch, matrices and [x; s1; s2] vectors of a piece
+        self._grid = np.zeros(capacity)
+        self._steps_buf = np.zeros(capacity, dtype=np.intp)
+        self._rows = np.zeros((capacity, 2 * WIDTH))
+        self._coef = np.zeros((3, capacity))
+        self._matrix = np.zeros(capacity * (S + 1) * (S + 2))
+        self._vector = np.zeros(capacity * (S + 2))
+        self._y = np.zeros(capacity * (S + 1))
+
+    def reset(self):
+        self.state[:] = 0.0
+
+    def process(self, wave, env=None):
+        """
+        Filter wave (voices, frames) in place, voice v with state row v.
+        env: envelope of the same shape driving the cutoff, or None.
+        """
+        n, frames = wave.shape
+        if n == 0:
+            return wave
+        shared = env is None or not self.env_amount
+        if shared:
+            key = (self.cutoff, self.resonance)
+            if key != self._shared_key:
+                self._shared.clear()
+                self._shared_key = key
+        elif self.resonance != self._table_key:
+            cutoffs = MIN_CUTOFF * 2 ** (np.arange(self._steps + 1) /
+                                         STEPS_PER_OCTAVE)
+            self._table, self._table_b0, self._table_a2 = \
+                filter_responses(self.fs, cutoffs, self.resonance)
+            self._table_key = self.resonance
+        for start in range(0, frames, SUB_BLOCK):
+            L = min(SUB_BLOCK, frames - start)
+            if shared:
+                self._apply_shared(wave[:, start:start + L], n, L)
+            else:
+                self._apply(wave[:, start:start + L], env[:, start], n, L)
+        return wave
+
+    def _apply(self, x, level, n, L):
+        """ Per-voice matrices for one piece of L frames """
+        # Grid step of every voice's cutoff at the start of the piece
+        grid = self._grid[:n]
+        steps = self._steps_buf[:n]
+        np.copyto(grid, level, casting='same_kind')
+        grid *= self.env_amount * STEPS_PER_OCTAVE
+        grid += math.log2(max(self.cutoff, MIN_CUTOFF) / MIN_CUTOFF) * \
+            STEPS_PER_OCTAVE
+        np.rint(grid, out=grid)
+        np.clip(grid, 0, self._steps, out=grid)
+        np.copyto(steps, grid, casting='unsafe')
+        rows = self._rows[:n]
+        np.take(self._table, steps, axis=0, out=rows, mode='clip')
+        b0, a2, _ = self._coef[:, :n]
+        np.take(self._table_b0, steps, out=b0, mode='clip')
+        np.take(self._table_a2, steps, out=a2, mode='clip')
+
+        index = self._index.get(L)
+        if index is None:
+            index = self._index[L] = _gather_index(L, self.capacity)
+        size = (L + 1) * (L + 2)
+        matrix = self._matrix[:n * size]
+        np.take(self._rows.ravel(), index[:n * size], out=matrix,
+                mode='clip')
+        vector = self._load(x, n, L)
+        y = self._y[:n * (L + 1)]
+        np.matmul(matrix.reshape(n, L + 1, L + 2),
+                  vector.reshape(n, L + 2, 1), out=y.reshape(n, L + 1, 1))
+        self._store(x, y.reshape(n, L + 1), vector, L, b0, a2)
+
+    def _apply_shared(self, x, n, L):
+        """ One exact matrix for all voices: a plain 2-D matmul """
+        matrix = self._shared.get(L)
+        if matrix is None:
+            rows, b0, a2 = filter_responses(self.fs, [self.cutoff],
+                                            self.resonance)
+            index = _gather_index(L, 1).reshape(L + 1, L + 2).T
+            matrix = self._shared[L] = rows.ravel()[index]
+            self._shared_coef = (float(b0[0]), float(a2[0]))
+        vector = self._load(x, n, L)
+        y = self._y[:n * (L + 1)].reshape(n, L + 1)
+        np.matmul(vector, matrix, out=y)
+        b0, a2 = self._shared_coef
+        self._store(x, y, vector, L, b0, a2)
+
+    def _load(self, x, n, L):
+        """ [x; s1; s2] rows of the n voices """
+        vector = self._vector[:n * (L + 2)].reshape(n, L + 2)
+        np.copyto(vector[:, :L], x, casting='same_kind')
+        vector[:, L:] = self.state[:n]
+        return vector
+
+    def _store(self, x, y, vector, L, b0, a2):
+        """
+        Output back into x and the state after the piece: s1 is the
+        zero-input output one step past it, s2 = b2 x[L-1] - a2 y[L-1]
+        with b2 = b0
+        """
+        n = len(y)
+        s1 = self.state[:n, 0]
+        s2 = self.state[:n, 1]
+        np.copyto(s1, y[:, L])
+        np.multiply(vector[:, L - 1], b0, out=s2)
+        work = self._coef[2, :n]
+        np.multiply(y[:, L - 1], a2, out=work)
+        s2 -= work
+        np.copyto(x, y[:, :L], casting='same_kind')
+# --- END Voice Filter Block ---
@@ -0,0 +1,92 @@
+""" --- CPU Governor Block ---
+Keeps the render load under the block deadline. update() gets the
+load of every rendered block (render time / block duration); while the
+smoothed load is above HIGH_LOAD the governor first steals released
+voices (quietest first), then steps down the LEVELS ladder: fewer
+chorus voices, then a shorter convolution reverb tail. At the last
+level a block that still misses the deadline steals the oldest held
+voice. After RECOVER_BLOCKS calm blocks below LOW_LOAD it steps back
+up one level at a time. Runs on the thread that renders, between
+blocks, so it changes the synth without locks.
+"""
+HIGH_LOAD = 0.8       # smoothed load that counts as over budget
+LOW_LOAD = 0.5        # smoothed load that allows restoring quality
+COOLDOWN_BLOCKS = 8   # blocks between two degrade steps
+RECOVER_BLOCKS = 200  # calm blocks before restoring one step
+SMOOTHING = 0.2       # weight of the newest block in the smoothed load
+
+# Degradation ladder: (max chorus voices, share of the convolution IR)
+LEVELS = [
+    (None, 1.0),  # full quality
+    (2, 1.0),
+    (2, 0.5),
+    (1, 0.25),
+    (1, 0.125),
+]
+
+
+class Governor:
+    def __init__(self, synth, high=HIGH_LOAD, low=LOW_LOAD,
+                 cooldown=COOLDOWN_BLOCKS, recover=RECOVER_BLOCKS):
+        self.synth = synth
+        self.high = high
+        self.low = low
+        self.cooldown = cooldown
+        self.recover = recover
+        self.level = 0          # index into LEVELS
+        self.load = 0.0         # smoothed load
+        self.steals = 0         # released voices stolen
+        self.held_steals = 0    # held voices stolen at the last level
+        self.degrades = 0       # steps down the ladder
+        self.restores = 0       # steps back up
+        self.chorus_voices = synth.chorus.voices  # full-quality setting
+        self._wait = 0
+        self._calm = 0
+
+    def update(self, load):
+        """ After every rendered block, on the rendering thread """
+        self.load += SMOOTHING * (load - self.load)
+        if self._wait:
+            self._wait -= 1
+        if self.load <= self.high:
+            if self.level and self.load < self.low:
+                self._calm += 1
+                if self._calm >= self.recover:
+                    self._calm = 0
+                    self.restores += 1
+                    self.set_level(self.level - 1)
+            else:
+                self._calm = 0
+            return
+        self._calm = 0
+        pool = self.synth.voice_pool
+        if pool.steal() >= 0:
+            self.steals += 1
+        elif self._wait:
+            pass
+        elif self.level < len(LEVELS) - 1:
+            self.degrades += 1
+            self.set_level(self.level + 1)
+            self._wait = self.cooldown
+        elif load > 1.0 and pool.steal(held=True) >= 0:
+            self.held_steals += 1
+
+    def set_level(self, level):
+        self.level = level
+        voices, length = LEVELS[level]
+        synth = self.synth
+        synth.chorus.voices = self.chorus_voices if voices is None \
+            else min(voices, self.chorus_voices)
+        if synth.conv_reverb is not None:
+            synth.conv_reverb.set_length(length)
+
+    def stats(self):
+        return {
+            'level': self.level,
+            'load': self.load,
+            'steals': self.steals,
+            'held_steals': self.held_steals,
+            'degrades': self.degrades,
+            'restores': self.restores,
+        }
+# --- END CPU Governor Block ---
@@ -0,0 +1,306 @@
+import numpy as np
+
+from .profiler import PROFILER
+
+
+""" --- DSP Graph Block ---
+Effects as nodes of a small graph instead of a hard-coded chain. The
+graph is edited on a control thread; compile() sorts the active nodes
+topologically, assigns every output a buffer from a pool (a buffer is
+reused as soon as its last reader has run, and in-place nodes work on
+their input's buffer when nothing else still reads it) and returns an
+immutable Schedule. The owner publishes it with a single reference
+assignment, so the audio thread either runs the old schedule or the
+new one, never a half-edited graph, and compiling allocates nothing on
+the audio thread. Effect state lives in the processors, not in the
+schedule, so recompiling does not reset any tail.
+Switching an in-place node with a fade crossfades it with its input
+instead of stepping the signal: a Fade ramps the node's wet level
+(processed minus input) in or out over a fixed number of frames. A
+node fading out stays in the schedule until its level reaches zero,
+then is bypassed and dropped by the next compile().
+
+INPUT is the block the synth rendered the voices into; the schedule
+runs in place on it and leaves the output there.
+"""
+INPUT = 'input'
+
+
+class Fade:
+    """
+    Wet level of a switched node: gain moves toward target (0.0 dry,
+    1.0 fully processed) by 1 / frames per sample on the render thread;
+    the control thread only assigns target.
+    """
+    __slots__ = ('step', 'gain', 'target')
+
+    def __init__(self, frames, gain=0.0, target=1.0):
+        self.step = 1.0 / max(frames, 1)
+        self.gain = gain
+        self.target = target
+
+
+class Node:
+    """
+    process(buffer) for in-place nodes (one input), otherwise
+    process(out, *inputs) writing a fresh buffer.
+    is_idle(): optional, True while the node has no tail left to play;
+    nodes without it are treated as stateless.
+    fade: optional Fade of an in-place node, see DSPGraph.set_enabled
+    """
+    __slots__ = ('name', 'process', 'inputs', 'in_place', 'enabled',
+                 'is_idle', 'span', 'fade')
+
+    def __init__(self, name, process, inputs=(INPUT,), in_place=True,
+                 enabled=True, is_idle=None):
+        if in_place and len(inputs) != 1:
+            raise ValueError(f"{name}: an in-place node has one input")
+        self.name = name
+        self.process = process
+        self.inputs = tuple(inputs)
+        self.in_place = in_place
+        self.enabled = enabled
+        self.is_idle = is_idle
+        self.span = PROFILER.span(name)
+        self.fade = None
+
+    @property
+    def active(self):
+        """ Enabled, or disabled but still fading out """
+        fade = self.fade
+        return self.enabled or (fade is not None and fade.gain > 0.0)
+
+
+class DSPGraph:
+    """ Control-thread side: nodes by name plus the output node """
+
+    def __init__(self):
+        self.nodes = {}
+        self.output = INPUT
+        self._removing = set()  # fading out, dropped once silent
+
+    def add(self, node, output=True):
+        """ Add a node; by default it becomes the graph output """
+        if node.name in self._removing:
+            self._drop(node.name)
+        if node.name in self.nodes or node.name == INPUT:
+            raise ValueError(f"Duplicate node name: {node.name}")
+        self.nodes[node.name] = node
+        if output:
+            self.output = node.name
+        return node
+
+    def insert(self, node, after):
+        """
+        Put a single-input node right after another one: every reader
+        of `after` (and the output, if it was `after`) reads the new node
+        """
+        if after != INPUT and after not in self.nodes:
+            raise KeyError(after)
+        node.inputs = (after,)
+        for other in self.nodes.values():
+            other.inputs = tuple(node.name if name == after else name
+                                 for name in other.inputs)
+        self.add(node, output=self.output == after)
+        return node
+
+    def remove(self, name, fade=0):
+        """
+        Drop a single-input node; its readers read its input. With
+        fade (frames) a sounding in-place node fades out first and a
+        later compile() drops it.
+        """
+        node = self.nodes[name]
+        if fade and node.in_place and node.active:
+            self.set_enabled(name, False, fade)
+            self._removing.add(name)
+            return
+        self._drop(name)
+
+    def _drop(self, name):
+        self._removing.discard(name)
+        node = self.nodes.pop(name)
+        source = node.inputs[0]
+        for other in self.nodes.values():
+            other.inputs = tuple(source if n == name else n
+                                 for n in other.inputs)
+        if self.output == name:
+            self.output = source
+
+    def set_enabled(self, name, on, fade=0):
+        """
+        Switch a node. With fade (frames) an in-place node crossfades
+        with its input; switching again mid-fade reverses from the
+        current level.
+        """
+        node = self.nodes[name]
+        if fade and node.in_place:
+            if node.fade is None:
+                node.fade = Fade(fade, 1.0 if node.active else 0.0)
+            node.fade.target = 1.0 if on else 0.0
+        else:
+            node.fade = None
+        node.enabled = on
+
+    def _resolve(self, name):
+        """ Skip inactive single-input nodes (bypass) """
+        while name != INPUT:
+            node = self.nodes.get(name)
+            if node is None:
+                raise KeyError(f"Unknown node input: {name}")
+            if node.active or len(node.inputs) != 1:
+                return name
+            name = node.inputs[0]
+        return name
+
+    def order(self):
+        """
+        Active nodes the output depends on, each after its inputs,
+        as (node, resolved input names). Raises ValueError on a cycle.
+        """
+        order = []
+        state = {}  # name -> 1 while visiting, 2 when placed
+
+        def visit(name):
+            if name == INPUT or state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in the DSP graph at {name}")
+            state[name] = 1
+            node = self.nodes[name]
+            inputs = tuple(self._resolve(n) for n in node.inputs)
+            for n in inputs:
+                visit(n)
+            state[name] = 2
+            order.append((node, inputs))
+
+        visit(self._resolve(self.output))
+        return order
+
+    def compile(self, max_block, dtype):
+        """ Topological order plus buffer assignment -> Schedule """
+        for name in [name for name in self._removing
+                     if not self.nodes[name].active]:
+            self._drop(name)
+        order = self.order()
+        output = self._resolve(self.output)
+        # Readers left per producer; the output counts as one more
+        readers = {INPUT: 0}
+        for node, inputs in order:
+            readers.setdefault(node.name, 0)
+            for name in inputs:
+                readers[name] += 1
+        readers[output] += 1
+
+        slot = {INPUT: 0}  # producer -> buffer slot (0: the block)
+        free = []          # pool slots whose value is dead
+        count = 1
+        steps = []
+        for node, inputs in order:
+            sources = [slot[name] for name in inputs]
+            copy = -1
+            if node.in_place and readers[inputs[0]] == 1:
+                # Last reader of its input: work on that buffer
+                target = sources[0]
+            else:
+                if free:
+                    target = free.pop()
+                else:
+                    target = count
+                    count += 1
+                if node.in_place:
+                    copy = sources[0]
+            for name in inputs:
+                readers[name] -= 1
+                if readers[name] == 0 and slot[name] != target \
+                        and slot[name] != 0:
+                    free.append(slot[name])
+            slot[node.name] = target
+            fade = node.fade if node.in_place else None
+            steps.append((node.process, node.span, node.in_place, target,
+                          tuple(sources), copy, fade))
+        buffers = [np.zeros(max_block, dtype=dtype)
+                   for _ in range(count - 1)]
+        idle = tuple((node.is_idle, node.fade) for node, _ in order
+                     if node.is_idle is not None)
+        fading = None
+        if any(step[-1] is not None for step in steps):
+            # Ramp basis k = 1 ... n, the input copy and the gain ramp
+            fading = (np.arange(1, max_block + 1, dtype=dtype),
+                      np.zeros(max_block, dtype=dtype),
+                      np.zeros(max_block, dtype=dtype))
+        return Schedule(steps, buffers, slot[output], idle, fading)
+
+
+class Schedule:
+    """
+    Compiled graph: a flat list of steps over numbered buffers. Slot 0
+    is the block passed to run(), the others come from the pool.
+    fading: (ramp basis, input copy, gain) work buffers for steps with
+    a Fade, None when there are none
+    """
+    __slots__ = ('steps', 'buffers', 'output', 'idle_checks', 'fading',
+                 '_views')
+
+    def __init__(self, steps, buffers, output, idle_checks, fading=None):
+        self.steps = steps
+        self.buffers = buffers
+        self.output = output
+        self.idle_checks = idle_checks
+        self.fading = fading
+        self._views = [None] * (len(buffers) + 1)
+
+    def idle(self):
+        for is_idle, fade in self.idle_checks:
+            if fade is not None and fade.gain == 0.0 and \
+                    fade.target == 0.0:
+                continue  # faded out: its tail is not heard
+            if not is_idle():
+                return False
+        return True
+
+    def _crossfade(self, process, out, fade, frames):
+        """ out = input + (processed - input) * gain ramp """
+        basis, dry, gain = self.fading
+        dry = dry[:frames]
+        gain = gain[:frames]
+        np.copyto(dry, out)
+        process(out)
+        step = fade.step if fade.target > fade.gain else -fade.step
+        np.multiply(basis[:frames], step, out=gain)
+        gain += fade.gain
+        np.minimum(gain, 1.0, out=gain)
+        np.maximum(gain, 0.0, out=gain)
+        out -= dry
+        out *= gain
+        out += dry
+        fade.gain = float(gain[-1])
+
+    def run(self, block):
+        """ Process block in place; on the thread that renders """
+        frames = len(block)
+        views = self._views
+        views[0] = block
+        for i, buffer in enumerate(self.buffers):
+            views[i + 1] = buffer[:frames]
+        for process, span, in_place, target, sources, copy, fade \
+                in self.steps:
+            t0 = PROFILER.begin()
+            out = views[target]
+            if in_place:
+                if copy >= 0:
+                    np.copyto(out, views[copy])
+                if fade is None:
+                    process(out)
+                elif fade.gain != fade.target:
+                    self._crossfade(process, out, fade, frames)
+                elif fade.gain:
+                    process(out)
+                # else faded out: bypassed until the next compile()
+            else:
+                process(out, *[views[i] for i in sources])
+            PROFILER.end(span, t0)
+        if self.output:
+            np.copyto(block, views[self.output])
+        return block
+# --- END DSP Graph Block ---
@@ -0,0 +1,287 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+""" --- Layer Engine Block ---
+Multi-timbral mode: the notes are played by N layers, each a full
+Synth with its own wave, envelope and effects settings, rendered by its
+own worker process (one core each, no shared GIL). Every layer writes
+LAYER_CHUNK frames at a time into its sample ring in one shared memory
+block, at most lookahead frames ahead of the mixer. In the audio
+process the mixer only sums the rings into the output block.
+
+Sync protocol, all counters in the shared block, each moved by one side:
+  heads[i]    frames layer i has written (worker i)
+  tail        frames the mixer has consumed (mixer)
+A layer with fewer than a block's frames ready is late: it is silent in
+that block and its worker skips ahead to the mixer's position.
+Note events go to every layer through a shared event ring, stamped with
+the frame they play at (tail + lookahead + offset), so they stay
+sample-exact with a constant lookahead delay.
+Workers are started as separate interpreters running this module
+(python -m pyano.layers) and get parameter changes as JSON lines on
+stdin; closing stdin stops them.
+"""
+LAYER_CHUNK = 64        # frames per worker render
+LAYER_LOOKAHEAD = 512   # frames each layer may render ahead of the mixer
+EVENT_SLOTS = 256       # note events in flight per layer
+SAMPLE = np.dtype('<f4')
+
+
+def _layout(buffer, layers, capacity):
+    """ (heads, tail, ev_heads, ev_tails, events, rings) over buffer """
+    counters = np.ndarray((3 * layers + 1,), dtype=np.int64, buffer=buffer)
+    offset = counters.nbytes
+    events = np.ndarray((layers, EVENT_SLOTS, 3), dtype=np.float64,
+                        buffer=buffer, offset=offset)
+    offset += events.nbytes
+    rings = np.ndarray((layers, capacity), dtype=SAMPLE, buffer=buffer,
+                       offset=offset)
+    return (counters[:layers], counters[layers:layers + 1],
+            counters[layers + 1:2 * layers + 1], counters[2 * layers + 1:],
+            events, rings)
+
+
+def _layout_size(layers, capacity):
+    return (3 * layers + 1) * 8 + layers * EVENT_SLOTS * 3 * 8 + \
+        layers * capacity * SAMPLE.itemsize
+
+
+class LayerEngine:
+    """
+    layers: one dict of Synth.configure() parameters per layer, e.g.
+    [{'wave_type': 'sine', 'voice_pool.adsr': {'release': 1.5}},
+     {'wave_type': 'sawtooth', 'chorus_on': True, 'amplitude': 0.3}]
+    render_into(out, events) has the signature of Synth.render_into, so
+    the audio callback can use either; out must be float32.
+    notes: note table (key -> frequency) for 'on' events without one
+    """
+
+    def __init__(self, fs, layers, chunk=LAYER_CHUNK,
+                 lookahead=LAYER_LOOKAHEAD, notes=None):
+        self.fs = fs
+        self.settings = [dict(layer) for layer in layers]
+        self.chunk = chunk
+        # Whole chunks, so a worker never writes across the ring end
+        # in the common case; at least two (one written, one read)
+        self.capacity = max(2, -(-lookahead // chunk)) * chunk
+        self.late = np.zeros(len(layers), dtype=np.int64)  # late blocks
+        self.dropped = 0  # note events lost on a full event ring
+        self.workers = []
+        self._shm = None
+        self._views = None
+        self.notes = notes if notes is not None else {}
+        # Key -> event code; known keys get theirs up front so the
+        # audio thread only adds entries for unexpected ones
+        self._codes = {key: i for i, key in enumerate(self.notes)}
+
+    @property
+    def latency(self):
+        """ Seconds between an event and its sound (the lookahead) """
+        return self.capacity / self.fs
+
+    def start(self):
+        n = len(self.settings)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=_layout_size(n, self.capacity))
+        self._views = _layout(self._shm.buf, n, self.capacity)
+        heads, tail, ev_heads, ev_tails, _, _ = self._views
+        heads[:] = 0
+        tail[:] = 0
+        ev_heads[:] = 0
+        ev_tails[:] = 0
+        # Workers import the package from where this one was imported
+        env = dict(os.environ)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(
+            [root] + [p for p in [env.get('PYTHONPATH')] if p])
+        for index, settings in enumerate(self.settings):
+            args = [sys.executable, '-m', 'pyano.layers',
+                    self._shm.name, str(index), str(n), str(self.capacity),
+                    str(self.chunk), str(self.fs), json.dumps(settings)]
+            self.workers.append(subprocess.Popen(
+                args, stdin=subprocess.PIPE, text=True, env=env))
+
+    def wait_ready(self, timeout=10.0):
+        """ Wait until every layer has filled its ring; False on timeout """
+        heads = self._views[0]
+        deadline = time.monotonic() + timeout
+        while int(heads.min()) < self.capacity:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def configure(self, index, params):
+        """
+        Control thread: Synth.configure(params) in layer index.
+        settings[index] keeps what the layer has been sent so far.
+        """
+        self.settings[index].update(params)
+        stdin = self.workers[index].stdin
+        stdin.write(json.dumps(params) + '\n')
+        stdin.flush()
+
+    def stop(self):
+        for worker in self.workers:
+            try:
+                worker.stdin.close()
+            except OSError:
+                pass
+        for worker in self.workers:
+            try:
+                worker.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+        self.workers = []
+        if self._shm is not None:
+            self._views = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def stats(self):
+        return {
+            'layers': len(self.settings),
+            'late': self.late.tolist(),
+            'dropped_events': self.dropped,
+        }
+
+    def _push_events(self, events, tail):
+        _, _, ev_heads, ev_tails, slots, _ = self._views
+        for offset, kind, key, freq in events:
+            code = self._codes.get(key)
+            if code is None:
+                code = self._codes[key] = len(self._codes)
+            if kind == 'on':
+                if freq is None:
+                    freq = self.notes[key]
+            else:
+                freq = 0.0  # note off
+            frame = tail + self.capacity + offset
+            for i in range(len(ev_heads)):
+                head = int(ev_heads[i])
+                if head - int(ev_tails[i]) >= EVENT_SLOTS:
+                    self.dropped += 1
+                    continue
+                slot = slots[i, head % EVENT_SLOTS]
+                slot[0] = frame
+                slot[1] = code
+                slot[2] = freq
+                # Publish only after the slot is fully written
+                ev_heads[i] = head + 1
+
+    def render_into(self, out, events=()):
+        """ Audio thread: sum the layers' next len(out) frames into out """
+        frames = len(out)
+        out.fill(0.0)
+        views = self._views
+        if views is None:
+            return out
+        heads, tail_word, _, _, _, rings = views
+        tail = int(tail_word[0])
+        if events:
+            self._push_events(events, tail)
+        start = tail % self.capacity
+        split = min(frames, self.capacity - start)
+        for i in range(len(heads)):
+            if int(heads[i]) - tail < frames:
+                # Late layer: silent in this block
+                self.late[i] += 1
+                continue
+            ring = rings[i]
+            np.add(out[:split], ring[start:start + split], out=out[:split])
+            if split < frames:
+                np.add(out[split:], ring[:frames - split], out=out[split:])
+        # Release the frames to the workers
+        tail_word[0] = tail + frames
+        return out
+# --- END Layer Engine Block ---
+
+
+# --- Layer Worker Block ---
+def _read_params(params):
+    """ stdin reader thread: JSON lines into params, None at EOF """
+    for line in sys.stdin:
+        if line.strip():
+            params.put(json.loads(line))
+    params.put(None)
+
+
+def run_worker(name, index, layers, capacity, chunk, fs, settings):
+    """ Render layer index into its ring until stdin is closed """
+    from .synth import Synth
+
+    shm = shared_memory.SharedMemory(name=name, track=False)
+    heads, tail_word, ev_heads, ev_tails, slots, rings = \
+        _layout(shm.buf, layers, capacity)
+    ring = rings[index]
+    synth = Synth(fs, blocksize=chunk, dtype=SAMPLE)
+    synth.configure(settings)
+    params = queue.SimpleQueue()
+    threading.Thread(target=_read_params, args=(params,),
+                     daemon=True).start()
+    block = np.zeros(chunk, dtype=SAMPLE)
+    events = []
+    poll = chunk / fs / 4
+    try:
+        while True:
+            stop = False
+            while not params.empty():
+                update = params.get()
+                if update is None:
+                    stop = True
+                    break
+                synth.configure(update)
+            if stop:
+                break
+            head = int(heads[index])
+            tail = int(tail_word[0])
+            if head < tail:
+                # Fell behind the mixer: skip to where it reads now
+                head = tail
+                heads[index] = head
+            if head + chunk - tail > capacity:
+                time.sleep(poll)
+                continue
+            # Note events due before the end of this chunk
+            events.clear()
+            ev_tail = int(ev_tails[index])
+            ev_head = int(ev_heads[index])
+            while ev_tail < ev_head:
+                frame, code, freq = slots[index, ev_tail % EVENT_SLOTS]
+                if frame >= head + chunk:
+                    break
+                offset = min(max(int(frame) - head, 0), chunk - 1)
+                if freq > 0.0:
+                    events.append((offset, 'on', int(code), float(freq)))
+                else:
+                    events.append((offset, 'off', int(code), None))
+                ev_tail += 1
+            ev_tails[index] = ev_tail
+            synth.render_into(block, events)
+            start = head % capacity
+            split = min(chunk, capacity - start)
+            ring[start:start + split] = block[:split]
+            ring[:chunk - split] = block[split:]
+            # Publish only after the samples are in place
+            heads[index] = head + chunk
+    finally:
+        del heads, tail_word, ev_heads, ev_tails, slots, rings, ring
+        shm.close()
+# --- END Layer Worker Block ---
+
+
+if __name__ == '__main__':
+    name, index, layers, capacity, chunk, fs, settings = sys.argv[1:8]
+    run_worker(name, int(index), int(layers), int(capacity), int(chunk),
+               int(fs), json.loads(settings))
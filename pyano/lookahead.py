@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+from .events import BlockClock
+
+
+""" --- Lookahead Render Block ---
+Optional double-buffered mode: a render thread runs the synth in large
+chunks (256 ... 1024 frames) into a single-producer / single-consumer
+sample ring, a few chunks ahead of the device. The PortAudio callback
+only copies its block out of the ring, so a Python hiccup on the
+render thread is absorbed by the lookahead instead of becoming a
+dropout. Key events are delayed by a constant (lookahead + output
+latency) and placed at their sample offset inside the chunk.
+"""
+
+
+class AudioRing:
+    """ Preallocated sample ring; each side only moves its own counter """
+    __slots__ = ('capacity', 'buffer', 'head', 'tail', 'underruns')
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.head = 0       # frames written since start (producer only)
+        self.tail = 0       # frames read since start (consumer only)
+        self.underruns = 0  # reads that found fewer frames than asked
+
+    def available(self):
+        return self.head - self.tail
+
+    def space(self):
+        return self.capacity - (self.head - self.tail)
+
+    def write(self, block):
+        """ Producer side; the caller checks space() first """
+        frames = len(block)
+        start = self.head % self.capacity
+        end = start + frames
+        if end <= self.capacity:
+            self.buffer[start:end] = block
+        else:
+            split = self.capacity - start
+            self.buffer[start:] = block[:split]
+            self.buffer[:end - self.capacity] = block[split:]
+        # Publish only after the samples are in place
+        self.head += frames
+
+    def read_into(self, out):
+        """
+        Consumer side: fill out from the ring, silence for whatever is
+        missing. Returns the number of frames taken from the ring.
+        """
+        frames = min(len(out), self.head - self.tail)
+        start = self.tail % self.capacity
+        end = start + frames
+        if end <= self.capacity:
+            out[:frames] = self.buffer[start:end]
+        else:
+            split = self.capacity - start
+            out[:split] = self.buffer[start:]
+            out[split:frames] = self.buffer[:end - self.capacity]
+        if frames < len(out):
+            out[frames:] = 0.0
+            self.underruns += 1
+        self.tail += frames
+        return frames
+
+
+class LookaheadRenderer(threading.Thread):
+    """
+    Render thread feeding an AudioRing.
+    chunk: frames rendered per synth call
+    lookahead: frames kept ahead of the device (rounded up to whole
+    chunks, at least two: one playing, one being rendered)
+    events(deadline, offset_of, frames): optional source of synth
+    events for a chunk; gets the monotonic deadline of the chunk and a
+    function mapping an event time to its sample offset.
+    governor: optional Governor fed with the load of every chunk
+    """
+
+    def __init__(self, synth, chunk=512, lookahead=1536, events=None,
+                 governor=None):
+        super().__init__(name='lookahead-render', daemon=True)
+        self.synth = synth
+        self.fs = synth.fs
+        self.chunk = chunk
+        chunks = max(2, -(-lookahead // chunk))
+        self.ring = AudioRing(chunks * chunk, dtype=synth.dtype)
+        self.events = events
+        self.governor = governor
+        self.rendered = 0         # chunks rendered since start
+        # Stream clock of the callback; key events also wait out the ring
+        self.clock = BlockClock(
+            self.fs, (self.ring.capacity + chunk) / self.fs)
+        self._anchor = None       # (ring position, its monotonic DAC time)
+        self._chunk_start = 0.0   # monotonic time of the chunk's sample 0
+        self._block = np.zeros(chunk, dtype=synth.dtype)
+        self._poll = chunk / self.fs / 4
+        self._stop_event = threading.Event()
+
+    @property
+    def latency(self):
+        """ Seconds of audio buffered ahead of the device """
+        return self.ring.capacity / self.fs
+
+    def stop(self):
+        self._stop_event.set()
+
+    def pull(self, out, time_info=None, now=None):
+        """ Audio callback side: copy the next block out of the ring """
+        self.clock.start_block(len(out), time_info, now)
+        # Reference assignment is atomic: read by the render thread
+        self._anchor = (self.ring.tail, self.clock.dac_time)
+        return self.ring.read_into(out)
+
+    def _offset(self, when, frames):
+        offset = int((when + self.clock.delay - self._chunk_start) * self.fs)
+        return min(max(offset, 0), frames - 1)
+
+    def _chunk_deadline(self, frames):
+        """ Events stamped before this are due in the next chunk """
+        anchor = self._anchor
+        if anchor is None:
+            return -np.inf  # stream not running yet: keep them queued
+        position, dac_time = anchor
+        self._chunk_start = dac_time + (self.ring.head - position) / self.fs
+        return self._chunk_start + frames / self.fs - self.clock.delay
+
+    def render_chunk(self):
+        frames = self.chunk
+        start = time.perf_counter_ns()
+        events = ()
+        if self.events is not None:
+            events = self.events(self._chunk_deadline(frames), self._offset,
+                                 frames)
+        self.synth.render_into(self._block, events)
+        self.ring.write(self._block)
+        self.rendered += 1
+        if self.governor is not None:
+            elapsed = time.perf_counter_ns() - start
+            self.governor.update(elapsed * self.fs / (frames * 1e9))
+
+    def prefill(self):
+        """ Fill the ring before the stream starts """
+        while self.ring.space() >= self.chunk:
+            self.render_chunk()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self.ring.space() >= self.chunk:
+                self.render_chunk()
+            else:
+                self._stop_event.wait(self._poll)
+# --- END Lookahead Render Block ---
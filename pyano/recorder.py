@@ -0,0 +1,158 @@
+import os
+import threading
+
+import numpy as np
+
+from .lookahead import AudioRing
+from .wavfile import WAV_HEADER_SIZE, wav_header
+
+
+""" --- Recorder Block ---
+Live capture of what the synth plays. The audio thread only copies
+each block into a preallocated AudioRing (push); a writer thread
+drains the ring in large chunks to disk with buffered I/O. When the
+disk falls behind and the ring is full, the block is dropped and
+counted instead of stalling the audio thread.
+Formats: 'wav' (32-bit float, header patched on close) or 'raw'
+(headerless little-endian float32). With memmap=True the file is grown
+one segment at a time and written through a memory map, so a long
+session is backed by the file instead of process memory.
+"""
+RING_SECONDS = 2.0     # audio buffered between the callback and the disk
+WRITE_CHUNK = 8192     # frames per disk write
+MAP_SEGMENT = 1 << 20  # frames mapped at once in memmap mode
+FILE_BUFFER = 1 << 20  # bytes of write buffer in file mode
+SAMPLE = np.dtype('<f4')
+
+
+class Recorder(threading.Thread):
+    """
+    Writer thread for one recording.
+    fmt: 'wav', 'raw' or None to pick by extension (.raw / .f32 are raw)
+    seconds: ring capacity; the disk may stall this long without drops
+    """
+
+    def __init__(self, path, fs, fmt=None, memmap=False,
+                 seconds=RING_SECONDS, chunk=WRITE_CHUNK):
+        super().__init__(name='recorder', daemon=True)
+        if fmt is None:
+            ext = os.path.splitext(path)[1].lower()
+            fmt = 'raw' if ext in ('.raw', '.f32') else 'wav'
+        if fmt not in ('wav', 'raw'):
+            raise ValueError(f"Unknown recording format: {fmt}")
+        self.path = path
+        self.fs = fs
+        self.fmt = fmt
+        self.memmap = memmap
+        self.chunk = chunk
+        self.ring = AudioRing(max(int(seconds * fs), 2 * chunk),
+                              dtype=np.float32)
+        self.frames = 0          # frames written to the file
+        self.dropped = 0         # blocks dropped on a full ring
+        self.dropped_frames = 0
+        self._header = WAV_HEADER_SIZE if fmt == 'wav' else 0
+        self._block = np.zeros(chunk, dtype=np.float32)
+        self._file = None
+        self._map = None
+        self._map_start = 0      # first frame of the mapped segment
+        self._poll = chunk / fs / 4
+        self._stop_event = threading.Event()
+
+    @property
+    def seconds(self):
+        return self.frames / self.fs
+
+    def push(self, block):
+        """ Audio thread: queue a copy of block, drop it if the ring is full """
+        ring = self.ring
+        if ring.space() < len(block):
+            self.dropped += 1
+            self.dropped_frames += len(block)
+            return False
+        ring.write(block)
+        return True
+
+    def stop(self):
+        """ Finish: the thread drains the ring and closes the file """
+        self._stop_event.set()
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'seconds': self.seconds,
+            'dropped': self.dropped,
+            'dropped_frames': self.dropped_frames,
+        }
+
+    def run(self):
+        self._open()
+        try:
+            ring = self.ring
+            while not self._stop_event.is_set():
+                if ring.available() >= self.chunk:
+                    self._drain(self.chunk)
+                else:
+                    self._stop_event.wait(self._poll)
+            while ring.available():
+                self._drain(min(self.chunk, ring.available()))
+        finally:
+            self._close()
+
+    def _open(self):
+        if self.memmap:
+            self._file = open(self.path, 'w+b', buffering=0)
+        else:
+            self._file = open(self.path, 'wb', buffering=FILE_BUFFER)
+        if self.fmt == 'wav':
+            self._file.write(wav_header(self.fs, 1, 32, True, 0))
+
+    def _drain(self, frames):
+        block = self._block[:frames]
+        self.ring.read_into(block)
+        if self.memmap:
+            self._write_mapped(block)
+        else:
+            self._file.write(block.data)
+        self.frames += frames
+
+    def _write_mapped(self, block):
+        pos = 0
+        frames = len(block)
+        while pos < frames:
+            offset = self.frames + pos - self._map_start
+            if self._map is None or offset >= len(self._map):
+                self._remap(self.frames + pos)
+                offset = 0
+            n = min(frames - pos, len(self._map) - offset)
+            self._map[offset:offset + n] = block[pos:pos + n]
+            pos += n
+
+    def _remap(self, start):
+        """ Grow the file by one segment and map it from frame start """
+        self._unmap()
+        self._file.truncate(self._header +
+                            (start + MAP_SEGMENT) * SAMPLE.itemsize)
+        self._map = np.memmap(self._file, dtype=SAMPLE, mode='r+',
+                              offset=self._header + start * SAMPLE.itemsize,
+                              shape=(MAP_SEGMENT,))
+        self._map_start = start
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+
+    def _close(self):
+        f = self._file
+        if f is None:
+            return
+        self._unmap()
+        if self.memmap:
+            # Cut the unused end of the last segment
+            f.truncate(self._header + self.frames * SAMPLE.itemsize)
+        if self.fmt == 'wav':
+            f.seek(0)
+            f.write(wav_header(self.fs, 1, 32, True, self.frames))
+        f.close()
+        self._file = None
+# --- END Recorder Block ---
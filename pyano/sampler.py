@@ -0,0 +1,215 @@
+import os
+import queue
+import re
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+
+import numpy as np
+
+from .wavfile import wav_info, read_wav
+
+
+""" --- Sampler Block ---
+Multisampled instruments: a directory of WAV files, one per root note,
+named by note name or MIDI number (piano_C4.wav, Bb3.wav, 60.wav).
+Opening a set parses every file's header; mono 16/32-bit PCM and float
+files are memory-mapped right away at the data offset wav_info()
+reports, so playback reads straight from the page cache and nothing
+is copied. Other layouts (stereo, 8/24-bit) are converted to float32
+by a SampleLoader thread and kept in a SampleCache bounded in bytes,
+least recently used out first. The thread that renders never reads a
+file: a note-on takes the zone's finished array if there is one and
+otherwise queues the zone for the loader; the voice stays silent until
+the array is published (zone.data, a single reference assignment).
+prepare(freq) queues the load earlier, from the event producer.
+Voices pick the nearest root and resample it with a phase accumulator
+(see VoicePool._read_samples).
+"""
+CACHE_BYTES = 256 << 20  # converted sample data kept in memory
+NOTE_OFFSETS = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+# Root note at the end of the file name: C4, C#4, Db4, -1 octaves, or 60
+_ROOT = re.compile(r'(?:^|[^A-Za-z0-9])(?:([A-G])([#b]?)(-?\d)|(\d{1,3}))$')
+
+
+def root_note(name):
+    """ MIDI note of a file name like 'piano_C#4.wav', or None (C4 = 60) """
+    match = _ROOT.search(os.path.splitext(os.path.basename(name))[0])
+    if match is None:
+        return None
+    letter, accidental, octave, number = match.groups()
+    if number is not None:
+        note = int(number)
+    else:
+        note = (int(octave) + 1) * 12 + NOTE_OFFSETS[letter] + \
+            {'#': 1, 'b': -1}.get(accidental, 0)
+    return note if 0 <= note <= 127 else None
+
+
+class SampleZone:
+    """
+    One file of a set. data: the playable 1-D array (memory map or
+    converted copy), None while a converted zone is not loaded
+    """
+    __slots__ = ('path', 'root', 'freq', 'info', 'data', 'scale', 'mapped')
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self.freq = 440.0 * 2 ** ((root - 69) / 12)
+        self.info = wav_info(path)
+        info = self.info
+        self.mapped = info.channels == 1 and info.bits != 8 and \
+            info.dtype is not None
+        if self.mapped:
+            self.data = np.memmap(path, dtype=info.dtype, mode='r',
+                                  offset=info.offset, shape=(info.frames,))
+            self.scale = info.scale
+        else:
+            self.data = None
+            self.scale = 1.0
+
+
+class SampleCache:
+    """ Converted sample arrays, at most max_bytes, LRU eviction """
+
+    def __init__(self, max_bytes=CACHE_BYTES, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # called with the key of a dropped entry
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, load):
+        """ Cached array for key, calling load() on a miss """
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = load()
+        self._entries[key] = data
+        self.bytes += data.nbytes
+        # The newest entry stays even if it alone is over the limit
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old = self._entries.popitem(last=False)
+            self.bytes -= old.nbytes
+            if self.on_evict is not None:
+                self.on_evict(old_key)
+        return data
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+
+class SampleLoader(threading.Thread):
+    """ Converts and caches the zones the render thread asks for """
+
+    def __init__(self, samples):
+        super().__init__(name='sample-loader', daemon=True)
+        self.samples = samples
+        self._requests = queue.SimpleQueue()
+
+    def request(self, zone):
+        """ Any thread: load zone (or mark it recently used) """
+        self._requests.put(zone)
+
+    def stop(self):
+        self._requests.put(None)
+
+    def run(self):
+        while True:
+            zone = self._requests.get()
+            if zone is None:
+                break
+            try:
+                self.samples.load(zone)
+            except Exception:
+                # The voice stays silent; keep serving other zones
+                traceback.print_exc(file=sys.stderr)
+
+
+class SampleSet:
+    """
+    Sample directory for VoicePool.sampler.
+    lookup(freq) -> (zone, scale, step): the zone of the nearest root
+    (zone.data is the 1-D sample array once loaded), the factor mapping
+    its samples to -1.0 ... 1.0, and the read step per output sample
+    and Hz of the played note.
+    background=False converts zones inline in lookup() instead of on a
+    loader thread (offline rendering, where every note must sound).
+    """
+
+    def __init__(self, path, fs, cache=None, background=True):
+        self.path = path
+        self.fs = fs
+        self.cache = cache if cache is not None else SampleCache()
+        self.cache.on_evict = self._evicted
+        zones = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith('.wav'):
+                    continue
+                root = root_note(entry.name)
+                if root is not None and root not in zones:
+                    zones[root] = SampleZone(entry.path, root)
+        if not zones:
+            raise ValueError(f"{path}: no WAV files named by root note")
+        self.zones = [zones[root] for root in sorted(zones)]
+        self._by_path = {zone.path: zone for zone in self.zones}
+        self._log_freqs = np.log2([zone.freq for zone in self.zones])
+        self.loader = None
+        if background and not all(zone.mapped for zone in self.zones):
+            self.loader = SampleLoader(self)
+            self.loader.start()
+
+    def close(self):
+        if self.loader is not None:
+            self.loader.stop()
+            self.loader = None
+
+    def zone_for(self, freq):
+        """ Zone with the root nearest to freq (in pitch) """
+        i = int(np.argmin(np.abs(self._log_freqs - np.log2(freq))))
+        return self.zones[i]
+
+    def prepare(self, freq):
+        """ Event producer: start loading what a note at freq plays """
+        zone = self.zone_for(freq)
+        if not zone.mapped and self.loader is not None:
+            self.loader.request(zone)
+        return zone
+
+    def lookup(self, freq):
+        zone = self.zone_for(freq)
+        if not zone.mapped:
+            if self.loader is not None:
+                # Also a hit: keeps the zone recent in the cache
+                self.loader.request(zone)
+            else:
+                self.load(zone)
+        return zone, zone.scale, zone.info.fs / (zone.freq * self.fs)
+
+    def load(self, zone):
+        """ Converted data of zone, from the cache or the file """
+        zone.data = self.cache.get(zone.path, lambda: self._convert(zone))
+        return zone.data
+
+    def _evicted(self, path):
+        zone = self._by_path.get(path)
+        if zone is not None:
+            zone.data = None
+
+    @staticmethod
+    def _convert(zone):
+        """ Mono float32 copy of a file that cannot be mapped as is """
+        _, samples = read_wav(zone.path)
+        return samples.mean(axis=1).astype(np.float32)
+# --- END Sampler Block ---
@@ -0,0 +1,378 @@
+import numpy as np
+
+from .voices import VoicePool
+from .effects import Chorus, DelayLine, MAX_BLOCK
+from .convolution import ConvolutionReverb
+from .sampler import SampleSet
+from .filters import VoiceFilter
+from .graph import DSPGraph, Node, Fade
+from .profiler import PROFILER
+
+
+""" --- Synth Core Block ---
+Note table, voice pool (with the optional per-voice filter) and the
+effects graph, by default chorus -> delay -> reverb -> convolution
+reverb -> tanh, with no audio device or keyboard dependencies.
+Switching an effect or inserting one recompiles the graph (graph.py)
+and swaps the new schedule in between two blocks.
+app_console.py drives it from the PortAudio callback, render_offline.py
+from an event file.
+"""
+FS = 48000  # Sample rate
+AMPLITUDE_GLIDE = 0.02  # seconds: volume changes glide, per sample
+EFFECT_FADE = 0.01  # seconds: effects switched while sounding crossfade
+
+# Frequencies of the sine waves for different notes
+# First octave
+FREQUENCY_C1 = 261.63  # Frequency of the sine wave (C1 note)
+FREQUENCY_C1_Diesis = 277.18  # Frequency of the sine wave (C1# note)
+FREQUENCY_D1 = 293.66  # Frequency of the sine wave (D1 note)
+FREQUENCY_D1_Diesis = 311.13  # Frequency of the sine wave (D1# note)
+FREQUENCY_E1 = 329.63  # Frequency of the sine wave (E1 note)
+FREQUENCY_F1 = 349.23  # Frequency of the sine wave (F1 note)
+FREQUENCY_F1_Diesis = 369.99  # Frequency of the sine wave (F1# note)
+FREQUENCY_G1 = 392.00  # Frequency of the sine wave (G1 note)
+FREQUENCY_G1_Diesis = 415.30  # Freqency of the sine wave (G1# note)
+FREQUENCY_A1 = 440.00  # Frequency of the sine wave (A1 note)
+FREQUENCY_A1_Diesis = 466.16  # Frequency of the sine wave (A1# note)
+FREQUENCY_B1 = 493.88  # Frequency of the sine wave (B1 note)
+# Second octave
+FREQUENCY_C2 = 523.25  # Frequency of the sine wave (C2 note)
+FREQUENCY_C2_Diesis = 554.37  # Frequency of the sine wave (C2# note)
+FREQUENCY_D2 = 587.33  # Frequency of the sine wave (D2 note)
+FREQUENCY_D2_Diesis = 622.25  # Frequency of the sine wave (D2# note)
+FREQUENCY_E2 = 659.25  # Frequency of the sine wave (E2 note)
+FREQUENCY_F2 = 698.46  # Frequency of the sine wave (F2 note)
+FREQUENCY_F2_Diesis = 739.99  # Frequency of the sine wave (F2# note)
+FREQUENCY_G2 = 783.99  # Frequency of the sine wave (G2 note)
+FREQUENCY_G2_Diesis = 830.61  # Frequency of the sine wave (G2# note)
+FREQUENCY_A2 = 880.00  # Frequency of the sine wave (A2 note)
+FREQUENCY_A2_Diesis = 932.33  # Frequency of the sine wave (A2# note)
+FREQUENCY_B2 = 987.77  # Frequency of the sine wave (B2 note)
+# Third octave
+FREQUENCY_C3 = 1046.50  # Frequency of the sine wave (C3 note)
+
+# --- Note Table Block ---
+NOTE_KEYS = {
+    # First octave (white keys)
+    'z': FREQUENCY_C1,
+    'x': FREQUENCY_D1,
+    'c': FREQUENCY_E1,
+    'v': FREQUENCY_F1,
+    'b': FREQUENCY_G1,
+    'n': FREQUENCY_A1,
+    'm': FREQUENCY_B1,
+    # First octave (black keys)
+    's': FREQUENCY_C1_Diesis,
+    'd': FREQUENCY_D1_Diesis,
+    'g': FREQUENCY_F1_Diesis,
+    'h': FREQUENCY_G1_Diesis,
+    'j': FREQUENCY_A1_Diesis,
+    # Second octave (white keys)
+    'q': FREQUENCY_C2,
+    'w': FREQUENCY_D2,
+    'e': FREQUENCY_E2,
+    'r': FREQUENCY_F2,
+    't': FREQUENCY_G2,
+    'y': FREQUENCY_A2,
+    'u': FREQUENCY_B2,
+    # Second octave (black keys)
+    '2': FREQUENCY_C2_Diesis,
+    '3': FREQUENCY_D2_Diesis,
+    '5': FREQUENCY_F2_Diesis,
+    '6': FREQUENCY_G2_Diesis,
+    '7': FREQUENCY_A2_Diesis,
+    # Third octave (white key)
+    'i': FREQUENCY_C3,
+}
+
+FREQ_TO_NAME = {
+    FREQUENCY_C1: 'C1', FREQUENCY_C1_Diesis: 'C#1', FREQUENCY_D1: 'D1', FREQUENCY_D1_Diesis: 'D#1',
+    FREQUENCY_E1: 'E1', FREQUENCY_F1: 'F1', FREQUENCY_F1_Diesis: 'F#1', FREQUENCY_G1: 'G1',
+    FREQUENCY_G1_Diesis: 'G#1', FREQUENCY_A1: 'A1', FREQUENCY_A1_Diesis: 'A#1', FREQUENCY_B1: 'B1',
+    FREQUENCY_C2: 'C2', FREQUENCY_C2_Diesis: 'C#2', FREQUENCY_D2: 'D2', FREQUENCY_D2_Diesis: 'D#2',
+    FREQUENCY_E2: 'E2', FREQUENCY_F2: 'F2', FREQUENCY_F2_Diesis: 'F#2', FREQUENCY_G2: 'G2',
+    FREQUENCY_G2_Diesis: 'G#2', FREQUENCY_A2: 'A2', FREQUENCY_A2_Diesis: 'A#2', FREQUENCY_B2: 'B2',
+    FREQUENCY_C3: 'C3'
+}
+# --- END Note Table Block ---
+
+
+def midi_to_freq(note):
+    """ Equal-tempered frequency of a MIDI note number (A4 = 69 = 440 Hz) """
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+
+SPAN_VOICES = PROFILER.span('voices')
+
+
+class Synth:
+    """
+    One instrument: voice pool plus effects graph and their parameters.
+    Parameters are plain attributes so control threads can change them
+    between blocks. All DSP runs in dtype on buffers allocated here for
+    blocks of up to max_block frames.
+    """
+
+    def __init__(self, fs=FS, voices=None, blocksize=64, dtype=np.float32,
+                 max_block=MAX_BLOCK):
+        self.fs = fs
+        self.blocksize = blocksize  # convolution partition size
+        self.dtype = np.dtype(dtype)
+        self.max_block = max_block
+        self.fade_frames = max(int(EFFECT_FADE * fs), 1)
+        self.voice_pool = VoicePool(fs, max_block=max_block, dtype=dtype) \
+            if voices is None else \
+            VoicePool(fs, capacity=voices, max_block=max_block, dtype=dtype)
+        self.amplitude = 0.5  # Volume
+        # Gain applied so far (None until the first block) and the ramp
+        # that glides it toward amplitude
+        self._gain = None
+        self._ramp = np.arange(1, max_block + 1, dtype=dtype)
+        self._gain_buf = np.zeros(max_block, dtype=dtype)
+        # 'sine', 'square', 'triangle', 'sawtooth' or 'sampler' (after
+        # load_samples)
+        self.wave_type = 'sine'
+
+        # Resonant low-pass per voice, cutoff driven by the envelope
+        self.filter_on = False
+        self.filter = VoiceFilter(fs, self.voice_pool.capacity)
+
+        # --- Reverb Effect Block ---
+        self.reverb_on = False
+        # Feedback comb: wet is the reverb amount (0.0 ... 1.0)
+        self.reverb = DelayLine(fs, max_delay_sec=0.5, delay_sec=0.08,
+                                wet=0.35, max_block=max_block, dtype=dtype)
+        # Convolution reverb, built on first use (see set_conv_reverb)
+        self.conv_reverb_on = False
+        self.conv_reverb = None
+        # --- END Reverb Effect Block ---
+
+        # --- Chorus & Delay Effect Block ---
+        self.chorus_on = False
+        self.chorus = Chorus(fs, depth=0.008, rate=1.1, voices=4, mix=0.28,
+                             max_block=max_block, dtype=dtype)
+
+        self.delay_on = False
+        # delay_sec can be changed at runtime (up to 2 s)
+        self.delay = DelayLine(fs, max_delay_sec=2.0, delay_sec=0.12,
+                               feedback=0.3, wet=0.45, max_block=max_block,
+                               dtype=dtype)
+        # --- END Chorus & Delay Effect Block ---
+
+        # Effects graph; the render thread only reads self.schedule
+        self.graph = DSPGraph()
+        for name, process, is_idle in (
+                ('chorus', self.chorus.process, lambda: self.chorus.idle),
+                ('delay', self.delay.process, lambda: self.delay.idle),
+                ('reverb', self.reverb.process, lambda: self.reverb.idle),
+                ('conv_reverb', self._conv_reverb,
+                 lambda: self.conv_reverb.idle)):
+            self.graph.add(Node(name, process, inputs=(self.graph.output,),
+                                enabled=False, is_idle=is_idle))
+        self.graph.add(Node('saturation', self._saturate,
+                            inputs=(self.graph.output,)))
+        self.schedule = None
+        self._swap()
+
+    def note_on(self, key, freq=None):
+        if freq is None:
+            freq = NOTE_KEYS[key]
+        self.voice_pool.note_on(key, freq)
+
+    def note_off(self, key):
+        self.voice_pool.note_off(key)
+
+    def load_samples(self, path, background=True):
+        """
+        Sample directory played by wave type 'sampler' (SampleSet).
+        background=False loads zones on first use instead of on the
+        loader thread (offline rendering).
+        """
+        old = self.voice_pool.sampler
+        self.voice_pool.sampler = SampleSet(path, self.fs,
+                                            background=background)
+        if old is not None:
+            old.close()
+
+    def prepare(self, freq):
+        """
+        Event producer side, before queueing a note-on: start loading
+        the sample zone it will play (no-op without a sampler)
+        """
+        sampler = self.voice_pool.sampler
+        if sampler is not None:
+            sampler.prepare(freq)
+
+    def configure(self, params):
+        """
+        Set parameters by name, e.g. {'wave_type': 'square',
+        'delay.delay_sec': 0.3, 'reverb_on': True}. Dotted names reach
+        into components; effect switches (*_on) go through set_*().
+        """
+        for name, param in params.items():
+            *path, attr = name.split('.')
+            target = self
+            for part in path:
+                target = getattr(target, part, None)
+            if target is None or not hasattr(target, attr):
+                raise ValueError(f"Unknown synth parameter: {name}")
+            switch = getattr(target, 'set_' + attr[:-3], None) \
+                if target is self and attr.endswith('_on') else None
+            if switch is not None:
+                switch(bool(param))
+            else:
+                setattr(target, attr, param)
+
+    def _swap(self):
+        """ Compile the graph here and publish it in one assignment """
+        self.schedule = self.graph.compile(self.max_block, self.dtype)
+
+    def _fade(self):
+        """ Crossfade length for a switch now; silence switches hard """
+        return 0 if self.idle else self.fade_frames
+
+    def _enable(self, name, on, effect=None):
+        """
+        Switch a node and swap the schedule in. Effects are reset on
+        the way in, while the render thread is not running them yet
+        (a node still fading out fades back in with its tail).
+        """
+        if on and effect is not None and not self.graph.nodes[name].active:
+            effect.reset()
+        self.graph.set_enabled(name, on, self._fade())
+        self._swap()
+
+    def insert_effect(self, name, process, after='conv_reverb',
+                      is_idle=None):
+        """
+        Add an in-place effect, process(buffer), right after the node
+        named after ('input' for straight after the voices); it fades
+        in from the dry signal
+        """
+        node = Node(name, process, is_idle=is_idle)
+        frames = self._fade()
+        if frames:
+            node.fade = Fade(frames)
+        self.graph.insert(node, after)
+        self._swap()
+        return node
+
+    def remove_effect(self, name):
+        """ Fade an effect out, then drop it from the graph """
+        self.graph.remove(name, self._fade())
+        self._swap()
+
+    def set_filter(self, on):
+        if on and not self.filter_on:
+            self.filter.reset()
+        self.filter_on = on
+        self.voice_pool.filter = self.filter if on else None
+
+    def set_reverb(self, on):
+        self.reverb_on = on
+        self._enable('reverb', on, self.reverb)
+
+    def load_impulse_response(self, ir=None):
+        """ ir: WAV path, sample array or None for the synthetic room """
+        if self.conv_reverb is None:
+            self.conv_reverb = ConvolutionReverb(self.fs, ir,
+                                                 partition=self.blocksize,
+                                                 dtype=self.dtype)
+        else:
+            self.conv_reverb.load(ir)
+
+    def set_conv_reverb(self, on):
+        if on and self.conv_reverb is None:
+            self.load_impulse_response()
+        self.conv_reverb_on = on
+        self._enable('conv_reverb', on, self.conv_reverb)
+
+    def set_chorus(self, on):
+        self.chorus_on = on
+        self._enable('chorus', on, self.chorus)
+
+    def set_delay(self, on):
+        self.delay_on = on
+        self._enable('delay', on, self.delay)
+
+    @property
+    def idle(self):
+        """ No sounding voice and every enabled effect past its tail """
+        return self.voice_pool.count == 0 and self.schedule.idle()
+
+    def _conv_reverb(self, buffer):
+        self.conv_reverb.process(buffer)
+
+    def _saturate(self, buffer):
+        target = self.amplitude
+        gain = self._gain
+        if gain is None or gain == target:
+            buffer *= target
+        else:
+            # Glide toward the new volume, a linear ramp within the block
+            frames = len(buffer)
+            step = (target - gain) * min(1.0,
+                                         frames / (AMPLITUDE_GLIDE * self.fs))
+            ramp = self._gain_buf[:frames]
+            np.multiply(self._ramp[:frames], step / frames, out=ramp)
+            ramp += gain
+            buffer *= ramp
+            if abs(target - gain - step) > 1e-4:
+                target = gain + step
+        self._gain = target
+        np.tanh(buffer, out=buffer)
+
+    def render(self, frames, events=()):
+        """
+        Render one block: all sounding voices, effects, volume and
+        tanh saturation. Returns the mono signal (frames,)
+        events: (sample offset, 'on'/'off', key, freq) sorted by offset;
+        the voices are rendered in segments split at those offsets.
+        """
+        return self.render_into(np.empty(frames, dtype=self.dtype), events)
+
+    def render_into(self, out, events=()):
+        """
+        Real-time variant of render(): writes the block straight into
+        out (e.g. outdata[:, 0]), which must have the synth dtype.
+        Nothing is allocated for blocks of up to max_block frames.
+        """
+        frames = len(out)
+        if frames > self.max_block:
+            # Longer than the work buffers: render in max_block pieces,
+            # each with the events that fall into it
+            for start in range(0, frames, self.max_block):
+                end = min(start + self.max_block, frames)
+                first, last = start == 0, end == frames
+                piece = [(offset - start, kind, key, freq)
+                         for offset, kind, key, freq in events
+                         if (first or offset >= start)
+                         and (last or offset < end)]
+                self.render_into(out[start:end], piece)
+            return out
+        if not events and self.idle:
+            # Silence in, silence out: skip the whole graph
+            out.fill(0.0)
+            return out
+        t0 = PROFILER.begin()
+        pool = self.voice_pool
+        if not events:
+            pool.render_into(out, self.wave_type)
+        else:
+            pos = 0
+            for offset, kind, key, freq in events:
+                offset = min(max(offset, pos), frames)
+                if offset > pos:
+                    pool.render_into(out[pos:offset], self.wave_type)
+                    pos = offset
+                if kind == 'on':
+                    self.note_on(key, freq)
+                else:
+                    self.note_off(key)
+            if pos < frames:
+                pool.render_into(out[pos:], self.wave_type)
+        PROFILER.end(SPAN_VOICES, t0)
+        self.schedule.run(out)
+        return out
+# --- END Synth Core Block ---
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+
+""" --- Telemetry Block ---
+Audio-thread health recording: PortAudio status flags, callback wall
+time and DSP load (render time / block duration) go into preallocated
+arrays and a fixed-bucket load histogram. record() only does index
+arithmetic and scalar stores; summaries and file dumps run on other
+threads.
+"""
+# PortAudio callback flags (paInputUnderflow ... paPrimingOutput)
+INPUT_UNDERFLOW = 0x01
+INPUT_OVERFLOW = 0x02
+OUTPUT_UNDERFLOW = 0x04
+OUTPUT_OVERFLOW = 0x08
+PRIMING_OUTPUT = 0x10
+FLAG_NAMES = {
+    INPUT_UNDERFLOW: 'input_underflow',
+    INPUT_OVERFLOW: 'input_overflow',
+    OUTPUT_UNDERFLOW: 'output_underflow',
+    OUTPUT_OVERFLOW: 'output_overflow',
+    PRIMING_OUTPUT: 'priming_output',
+}
+XRUN_MASK = INPUT_UNDERFLOW | INPUT_OVERFLOW | OUTPUT_UNDERFLOW | \
+    OUTPUT_OVERFLOW
+
+LOAD_BUCKET = 0.05  # histogram bucket width (fraction of the deadline)
+LOAD_BUCKETS = 41   # 0 ... 2.0, last bucket collects everything above
+HIGH_LOAD = 0.9     # an xrun after a block this loaded is blamed on DSP
+
+
+def status_bits(status):
+    """ sounddevice.CallbackFlags (or an int) as PortAudio flag bits """
+    if not status:
+        return 0
+    if isinstance(status, int):
+        return status
+    bits = 0
+    for bit, name in FLAG_NAMES.items():
+        if getattr(status, name, False):
+            bits |= bit
+    return bits
+
+
+class Telemetry:
+    def __init__(self, fs, capacity=4096):
+        self.fs = fs
+        self.capacity = capacity
+        self.start_ns = np.zeros(capacity, dtype=np.int64)
+        self.duration_ns = np.zeros(capacity, dtype=np.int64)
+        self.load = np.zeros(capacity)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.histogram = np.zeros(LOAD_BUCKETS, dtype=np.int64)
+        self.flag_counts = np.zeros(len(FLAG_NAMES), dtype=np.int64)
+        self.xruns_dsp = 0   # xrun right after a block over HIGH_LOAD
+        self.xruns_host = 0  # xrun while the synth kept up
+        self.count = 0       # blocks recorded since start (write index)
+        self._last_load = 0.0
+
+    def record(self, start_ns, end_ns, frames, status=None):
+        """ Audio thread: one entry per callback; returns the block load """
+        duration = end_ns - start_ns
+        load = duration * self.fs / (frames * 1e9) if frames else 0.0
+        slot = self.count % self.capacity
+        self.start_ns[slot] = start_ns
+        self.duration_ns[slot] = duration
+        self.load[slot] = load
+        bucket = int(load / LOAD_BUCKET)
+        self.histogram[bucket if bucket < LOAD_BUCKETS else
+                       LOAD_BUCKETS - 1] += 1
+        bits = status_bits(status) if status else 0
+        self.flags[slot] = bits
+        if bits:
+            for i in range(len(FLAG_NAMES)):
+                if bits >> i & 1:
+                    self.flag_counts[i] += 1
+            # PortAudio reports an xrun on the block after the late one
+            if bits & XRUN_MASK:
+                if self._last_load > HIGH_LOAD:
+                    self.xruns_dsp += 1
+                else:
+                    self.xruns_host += 1
+        self._last_load = load
+        self.count += 1
+        return load
+
+    def recent(self):
+        """ Copies of the ring entries in time order (reader side) """
+        if self.count > self.capacity:
+            order = (np.arange(self.capacity) + self.count) % self.capacity
+        else:
+            order = np.arange(self.count)
+        return {
+            'start_ns': self.start_ns[order],
+            'duration_ns': self.duration_ns[order],
+            'load': self.load[order],
+            'flags': self.flags[order],
+        }
+
+    def summary(self):
+        """ JSON-friendly view of the current state (reader side) """
+        recent = self.recent()
+        load = recent['load']
+        counts = self.flag_counts.tolist()
+        result = {
+            'time': time.time(),
+            'blocks': int(self.count),
+            'xruns': int(self.xruns_dsp + self.xruns_host),
+            'xruns_dsp': int(self.xruns_dsp),
+            'xruns_host': int(self.xruns_host),
+            'flags': {name: counts[i]
+                      for i, name in enumerate(FLAG_NAMES.values())},
+            'load_histogram': {
+                'bucket': LOAD_BUCKET,
+                'counts': self.histogram.tolist(),
+            },
+        }
+        if load.size:
+            p50, p99 = np.percentile(load, [50, 99])
+            result['load'] = {
+                'window': int(load.size),
+                'mean': float(load.mean()),
+                'p50': float(p50),
+                'p99': float(p99),
+                'max': float(load.max()),
+            }
+        return result
+
+
+class TelemetryWriter(threading.Thread):
+    """ Appends a telemetry summary to a JSON lines file every interval """
+
+    def __init__(self, telemetry, path, interval=5.0):
+        super().__init__(name='telemetry-writer', daemon=True)
+        self.telemetry = telemetry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def dump(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.telemetry.summary()) + '\n')
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+        self.dump()
+# --- END Telemetry Block ---
@@ -0,0 +1,213 @@
+import os
+import sys
+import threading
+from typing import NamedTuple
+
+from .synth import FREQ_TO_NAME
+from .governor import LEVELS
+
+
+""" --- Console UI Block ---
+The audio thread only publishes an immutable StatusSnapshot (a single
+reference assignment, no locks, no I/O), and only when the notes or a
+setting changed; the block peak is published on its own as a float.
+A separate UI thread redraws the status with ANSI cursor control at a
+capped frame rate.
+"""
+
+
+class StatusSnapshot(NamedTuple):
+    notes: tuple        # frequencies of the held notes
+    volume: float
+    wave: str
+    reverb_on: bool
+    reverb_amount: float
+    conv_reverb_on: bool
+    chorus_on: bool
+    chorus_depth: float
+    chorus_rate: float
+    delay_on: bool
+    delay_time: float
+    delay_feedback: float
+
+
+def snapshot(synth, notes):
+    """ Built on the audio thread from the synth state after a block """
+    return StatusSnapshot(
+        tuple(notes), synth.amplitude, synth.wave_type,
+        synth.reverb_on, synth.reverb.wet, synth.conv_reverb_on,
+        synth.chorus_on, synth.chorus.depth, synth.chorus.rate,
+        synth.delay_on, synth.delay.delay_sec, synth.delay.feedback)
+
+
+def is_current(snap, synth, notes):
+    """
+    Audio thread: snap still shows synth and notes (a tuple, compared
+    by identity), so nothing needs publishing. Allocates nothing.
+    """
+    return (snap is not None and snap.notes is notes
+            and snap.volume == synth.amplitude
+            and snap.wave == synth.wave_type
+            and snap.reverb_on == synth.reverb_on
+            and snap.reverb_amount == synth.reverb.wet
+            and snap.conv_reverb_on == synth.conv_reverb_on
+            and snap.chorus_on == synth.chorus_on
+            and snap.chorus_depth == synth.chorus.depth
+            and snap.chorus_rate == synth.chorus.rate
+            and snap.delay_on == synth.delay_on
+            and snap.delay_time == synth.delay.delay_sec
+            and snap.delay_feedback == synth.delay.feedback)
+
+
+WAVE_NAMES = {
+    'sine': 'Sine',
+    'square': 'Square',
+    'triangle': 'Triangle',
+    'sawtooth': 'Sawtooth',
+    'sampler': 'Sampler'
+}
+
+
+def format_status(snap, peak=0.0, ir_label='synthetic room'):
+    """ Status lines for a snapshot and block peak (on the UI thread) """
+    if snap.notes:
+        note_names = [FREQ_TO_NAME.get(round(freq, 2), str(freq))
+                      for freq in snap.notes]
+        notes_line = f"Notes: {', '.join(note_names)} | Real amplitude: {peak:.2f}"
+    else:
+        notes_line = f"Notes: (none) | Real amplitude: {peak:.2f}"
+    return [
+        notes_line,
+        f"Volume: {round(snap.volume, 2)}",
+        f"Wave: {WAVE_NAMES.get(snap.wave, snap.wave)}",
+        f"Reverb: {'ON' if snap.reverb_on else 'OFF'} (Amount: {snap.reverb_amount})",
+        f"Convolution reverb: {'ON' if snap.conv_reverb_on else 'OFF'} (IR: {ir_label})",
+        f"Chorus: {'ON' if snap.chorus_on else 'OFF'} (Depth: {snap.chorus_depth}, Rate: {snap.chorus_rate})",
+        f"Delay: {'ON' if snap.delay_on else 'OFF'} (Time: {snap.delay_time}, Feedback: {snap.delay_feedback})",
+    ]
+
+
+EFFECT_LABELS = (('reverb', 'Reverb'), ('conv_reverb', 'Convolution reverb'),
+                 ('chorus', 'Chorus'), ('delay', 'Delay'))
+
+
+def format_layers(layers):
+    """ One line per layer from its settings (LayerEngine.settings) """
+    lines = []
+    for i, settings in enumerate(layers):
+        wave = settings.get('wave_type')
+        effects = [label for name, label in EFFECT_LABELS
+                   if settings.get(name + '_on')]
+        lines.append(
+            f"Layer {i + 1}: {WAVE_NAMES.get(wave, wave)} | "
+            f"Volume: {round(settings.get('amplitude', 0.0), 2)} | "
+            f"Effects: {', '.join(effects) or 'none'}")
+    return lines
+
+
+def format_health(telemetry):
+    """ DSP load and xrun line from the telemetry ring """
+    n = min(telemetry.count, 256)
+    if n == 0:
+        return "DSP load: - | Xruns: 0"
+    load = telemetry.recent()['load'][-n:]
+    xruns = telemetry.xruns_dsp + telemetry.xruns_host
+    return (f"DSP load: {load.mean():.0%} (max {load.max():.0%}) | "
+            f"Xruns: {xruns} (synth {telemetry.xruns_dsp}, "
+            f"host {telemetry.xruns_host})")
+
+
+def format_governor(governor):
+    """ Degradation level and steal counters of the CPU governor """
+    voices, length = LEVELS[governor.level]
+    quality = 'full' if governor.level == 0 else \
+        f"chorus {min(voices, governor.chorus_voices)} voices, IR {length:.0%}"
+    return (f"Governor: level {governor.level} ({quality}) | "
+            f"Steals: {governor.steals} released, {governor.held_steals} held"
+            f" | Degrades: {governor.degrades}, restores: {governor.restores}")
+
+
+def format_recording(recorder):
+    """ File, length and dropped blocks of the current / last recording """
+    state = 'ON' if recorder.is_alive() else 'saved'
+    return (f"Recording: {state} {recorder.path} ({recorder.seconds:.1f} s)"
+            f" | Dropped: {recorder.dropped} blocks")
+
+
+def _enable_ansi():
+    """ Turn on VT escape processing in the Windows console (no subprocess) """
+    if os.name != 'nt':
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)
+    except (AttributeError, OSError):
+        pass
+
+
+class StatusDisplay(threading.Thread):
+    """
+    UI thread: redraws the status lines when any of them changed (the
+    snapshot, the block peak, telemetry), at most fps times per second.
+    layers: per-layer settings (LayerEngine.settings), shown instead of
+    the synth's volume, wave and effect lines
+    """
+
+    def __init__(self, header, fps=15, ir_label='synthetic room',
+                 stream=None, telemetry=None, governor=None, layers=None):
+        super().__init__(name='status-display', daemon=True)
+        self.header = header
+        self.telemetry = telemetry
+        self.governor = governor
+        self.layers = layers
+        self.recorder = None  # set when a recording starts
+        self.peak = 0.0  # peak of the last block, set by the audio thread
+        self.interval = 1.0 / fps
+        self.ir_label = ir_label
+        self.stream = stream if stream is not None else sys.stdout
+        self._snapshot = None
+        self._stop_event = threading.Event()
+
+    def publish(self, snap):
+        # Reference assignment is atomic: safe from the audio callback
+        self._snapshot = snap
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        _enable_ansi()
+        header_rows = self.header.count('\n') + 1
+        # Clear the screen and draw the static header once
+        self.stream.write('\x1b[2J\x1b[H' + self.header + '\n')
+        self.stream.flush()
+        last_lines = None
+        while not self._stop_event.wait(self.interval):
+            # Snapshots only come with changes: redraw from the current
+            # one every frame, writing only when a line changed
+            snap = self._snapshot
+            if snap is None:
+                continue
+            lines = format_status(snap, self.peak, self.ir_label)
+            if self.layers is not None:
+                lines = lines[:1] + format_layers(self.layers)
+            if self.telemetry is not None:
+                lines.append(format_health(self.telemetry))
+            if self.governor is not None:
+                lines.append(format_governor(self.governor))
+            if self.recorder is not None:
+                lines.append(format_recording(self.recorder))
+            if lines == last_lines:
+                continue
+            last_lines = lines
+            # Jump below the header and rewrite the status lines in place
+            out = [f'\x1b[{header_rows + 1};1H']
+            out.extend(line + '\x1b[K\n' for line in lines)
+            self.stream.write(''.join(out))
+            self.stream.flush()
+# --- END Console UI Block ---
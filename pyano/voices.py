@@ -0,0 +1,340 @@
+import numpy as np
+
+from .envelope import IDLE, ATTACK, RELEASE, ADSR, EnvelopeScratch, \
+    render_envelopes
+from .wavetable import wavetable_bank
+from .effects import MAX_BLOCK
+from .profiler import PROFILER
+
+
+""" --- Voice Pool Block ---
+Fixed-capacity polyphony: every voice lives in a slot of parallel
+NumPy arrays, so all sounding voices render as one (voices, frames)
+array operation and are mixed with a single reduction.
+Sounding voices are kept packed in slots [0, count): a block works on
+slices of the state and of work buffers sized once for max_block, so
+rendering allocates nothing. Per-voice values are spread over a block
+with a matmul against a (ramp, ones) basis rather than a broadcasting
+ufunc, which would allocate iterator buffers.
+With a sampler set, wave type 'sampler' reads each voice from its own
+sample array instead of the wavetable bank: a float64 position
+accumulator advances by the pitch ratio, and the two neighbouring
+samples are interpolated linearly. A voice whose zone is still being
+loaded stays silent until its data is published; one whose sample
+runs out retires.
+An optional VoiceFilter (filter attribute) runs on the voices before
+the amplitude envelope is applied; the envelope can drive its cutoff.
+"""
+MAX_VOICES = 64
+STEAL_FADE = 0.005  # seconds: a stolen voice fades out this fast (no click)
+
+SPAN_OSCILLATORS = PROFILER.span('oscillators')
+SPAN_ENVELOPE = PROFILER.span('envelope')
+SPAN_FILTER = PROFILER.span('filter')
+SPAN_MIX = PROFILER.span('mix')
+
+
+class VoicePool:
+    __slots__ = ('fs', 'capacity', 'max_block', 'dtype', 'bank', 'count',
+                 'freq', 'inc', 'offset', 'phase', 'stage', 'level',
+                 'release_step', 'gate', 'key', 'age', '_counter', '_osc',
+                 '_rows', '_basis', '_phase_buf', '_wave_buf', '_index_buf',
+                 '_idle', '_env', 'sampler', 'sample', 'sample_scale',
+                 'sample_step', 'sample_pos', 'sample_zone', '_ramp',
+                 '_pos_buf', '_floor_buf', '_a_buf', '_b_buf', '_raw_bufs',
+                 '_ended', 'filter', '_adsr')
+
+    def __init__(self, fs, capacity=MAX_VOICES, bank=None,
+                 max_block=MAX_BLOCK, dtype=np.float64):
+        self.fs = fs
+        self.capacity = capacity
+        self.max_block = max_block
+        self.dtype = np.dtype(dtype)
+        self.bank = bank if bank is not None else \
+            wavetable_bank(fs, dtype=dtype)
+        self._adsr = dict(ADSR)              # this pool's envelope
+        self.count = 0                       # sounding voices
+        self.freq = np.zeros(capacity)
+        # (inc, phase) and (0, offset) rows for the basis matmul
+        self._osc = np.zeros((capacity, 2), dtype=dtype)
+        self._rows = np.zeros((capacity, 2), dtype=dtype)
+        self.inc = self._osc[:, 0]       # phase step per sample, cycles
+        self.phase = self._osc[:, 1]     # phase accumulator, cycles
+        self.offset = self._rows[:, 1]   # mip level row in the bank
+        self.stage = np.full(capacity, IDLE, dtype=np.int8)
+        self.level = np.zeros(capacity, dtype=dtype)
+        self.release_step = np.zeros(capacity, dtype=dtype)
+        self.gate = np.zeros(capacity, dtype=bool)   # key is held
+        self.key = np.full(capacity, None, dtype=object)
+        self.age = np.zeros(capacity, dtype=np.int64)  # note-on order
+        self._counter = 0
+        # Work buffers for a whole block of every voice
+        self._basis = np.ones((2, max_block), dtype=dtype)
+        self._basis[0] = np.arange(max_block)
+        self._phase_buf = np.empty(capacity * max_block, dtype=dtype)
+        self._wave_buf = np.empty(capacity * max_block, dtype=dtype)
+        self._index_buf = np.empty(capacity * max_block, dtype=np.intp)
+        self._idle = np.empty(capacity, dtype=bool)
+        self._env = EnvelopeScratch(capacity, max_block, dtype)
+        self.filter = None  # VoiceFilter with state rows per slot
+        # Sample playback (wave type 'sampler'), see SampleSet
+        self.sampler = None
+        self.sample = np.full(capacity, None, dtype=object)  # 1-D arrays
+        self.sample_zone = np.full(capacity, None, dtype=object)
+        self.sample_scale = np.ones(capacity)
+        self.sample_step = np.zeros(capacity)  # source frames per sample
+        self.sample_pos = np.zeros(capacity)   # read position, frames
+        self._ramp = np.arange(max_block, dtype=np.float64)
+        self._pos_buf = np.empty(max_block)
+        self._floor_buf = np.empty(max_block)
+        self._a_buf = np.empty(max_block)
+        self._b_buf = np.empty(max_block)
+        # take() into a buffer of the sample's own dtype, then a casting
+        # copyto: mixed-dtype ufuncs would allocate
+        self._raw_bufs = {np.dtype(t): np.empty(max_block, dtype=t)
+                          for t in ('<i2', '<i4', '<f4', '<f8')}
+        self._ended = np.empty(capacity, dtype=bool)
+
+    @property
+    def adsr(self):
+        return self._adsr
+
+    @adsr.setter
+    def adsr(self, params):
+        """
+        Update some or all envelope times, e.g. {'release': 0.5}.
+        The merged dict is published in one assignment, so a block
+        never sees half an update.
+        """
+        unknown = set(params) - set(ADSR)
+        if unknown:
+            raise ValueError(f"Unknown envelope parameter: {unknown.pop()}")
+        self._adsr = {**self._adsr, **params}
+
+    def _find(self, key):
+        hits = np.flatnonzero(self.key[:self.count] == key)
+        return int(hits[0]) if hits.size else -1
+
+    def _allocate(self):
+        if self.count < self.capacity:
+            self.count += 1
+            return self.count - 1
+        # Pool is full: steal the quietest released voice, else the oldest
+        released = np.flatnonzero(self.stage == RELEASE)
+        if released.size:
+            return int(released[np.argmin(self.level[released])])
+        return int(np.argmin(self.age))
+
+    def _retire(self, idle):
+        """ Move the last sounding voices into the slots of finished ones """
+        fields = (self.freq, self.inc, self.offset, self.phase, self.stage,
+                  self.level, self.release_step, self.gate, self.key,
+                  self.age, self.sample, self.sample_scale, self.sample_step,
+                  self.sample_pos, self.sample_zone)
+        for v in np.flatnonzero(idle)[::-1]:
+            last = self.count - 1
+            if v != last:
+                for field in fields:
+                    field[v] = field[last]
+            if self.filter is not None and v != last:
+                self.filter.state[v] = self.filter.state[last]
+            self.key[last] = None
+            self.sample[last] = None
+            self.sample_zone[last] = None
+            self.gate[last] = False
+            self.stage[last] = IDLE
+            self.count = last
+
+    def note_on(self, key, freq):
+        v = self._find(key)
+        if v < 0:
+            v = self._allocate()
+            self.phase[v] = 0.0
+            self.level[v] = 0.0
+            if self.filter is not None:
+                self.filter.state[v] = 0.0
+        # A retriggered voice keeps its phase and attacks from its level
+        self._counter += 1
+        self.key[v] = key
+        self.freq[v] = freq
+        self.inc[v] = freq / self.fs
+        self.offset[v] = self.bank.offset_for(freq)
+        if self.sampler is not None:
+            # Samples restart on every note-on; data is None until the
+            # loader has converted the zone
+            zone, scale, step = self.sampler.lookup(freq)
+            self.sample[v] = zone.data
+            self.sample_zone[v] = zone
+            self.sample_scale[v] = scale
+            self.sample_step[v] = step * freq
+            self.sample_pos[v] = 0.0
+        self.stage[v] = ATTACK
+        self.gate[v] = True
+        self.age[v] = self._counter
+        return v
+
+    def note_off(self, key):
+        v = self._find(key)
+        if v < 0 or not self.gate[v]:
+            return
+        self.gate[v] = False
+        self.stage[v] = RELEASE
+        # Release starts from the current level, lasts adsr['release']
+        self.release_step[v] = self.level[v] / \
+            max(self._adsr['release'] * self.fs, 1.0)
+
+    def active_count(self):
+        return self.count
+
+    def steal(self, held=False):
+        """
+        Fade out one voice within STEAL_FADE to save its render cost:
+        the quietest released voice, or with held=True the oldest held
+        one. Returns the slot, or -1 if there is nothing to steal.
+        """
+        n = self.count
+        fade = max(STEAL_FADE * self.fs, 1.0)
+        if held:
+            candidates = np.flatnonzero(self.gate[:n])
+            if candidates.size == 0:
+                return -1
+            v = int(candidates[np.argmin(self.age[candidates])])
+            self.gate[v] = False
+            self.stage[v] = RELEASE
+        else:
+            # Released voices that are not already fading this fast
+            candidates = np.flatnonzero(
+                (self.stage[:n] == RELEASE) &
+                (self.level[:n] > self.release_step[:n] * fade))
+            if candidates.size == 0:
+                return -1
+            v = int(candidates[np.argmin(self.level[candidates])])
+        self.release_step[v] = self.level[v] / fade
+        return v
+
+    def render(self, frames, wave_type='sine'):
+        """
+        Render all active voices for one block.
+        Returns the mixed mono signal (frames,)
+        """
+        return self.render_into(np.empty(frames, dtype=self.dtype),
+                                wave_type)
+
+    def render_into(self, out, wave_type='sine'):
+        """
+        Mix all active voices into out (frames,) of the pool dtype,
+        overwriting it. Allocates nothing for blocks up to max_block.
+        """
+        frames = len(out)
+        n = self.count
+        if n == 0:
+            out.fill(0.0)
+            return out
+        if frames > self.max_block:
+            for start in range(0, frames, self.max_block):
+                self.render_into(out[start:start + self.max_block],
+                                 wave_type)
+            return out
+        size = n * frames
+        ph = self._phase_buf[:size].reshape(n, frames)
+        wave = self._wave_buf[:size].reshape(n, frames)
+        rows = self._env.tmp[:size].reshape(n, frames)
+        index = self._index_buf[:size].reshape(n, frames)
+        basis = self._basis[:, :frames]
+
+        t0 = PROFILER.begin()
+        ended = None
+        if wave_type == 'sampler':
+            ended = self._read_samples(wave, index[0])
+        else:
+            # Phase of every voice for every frame of the block; the
+            # accumulator runs continuously across blocks and note changes
+            phase = self.phase[:n]
+            np.matmul(self._osc[:n], basis, out=ph)
+            np.floor(ph, out=wave)
+            ph -= wave
+            np.add(ph[:, -1], self.inc[:n], out=phase)
+            np.mod(phase, 1.0, out=phase)
+            np.matmul(self._rows[:n], basis, out=rows)
+            self.bank.read_into(wave_type, ph, rows, wave, index)
+        PROFILER.end(SPAN_OSCILLATORS, t0)
+
+        # The envelope reuses the phase buffer
+        t0 = PROFILER.begin()
+        stage = self.stage[:n]
+        env = ph
+        render_envelopes(stage, self.level[:n], self.release_step[:n], env,
+                         self.fs, self._env, self._adsr)
+        PROFILER.end(SPAN_ENVELOPE, t0)
+
+        if self.filter is not None:
+            t0 = PROFILER.begin()
+            self.filter.process(wave, env)
+            PROFILER.end(SPAN_FILTER, t0)
+
+        t0 = PROFILER.begin()
+        wave *= env
+        np.sum(wave, axis=0, out=out)
+        PROFILER.end(SPAN_MIX, t0)
+
+        if ended is not None:
+            np.copyto(stage, IDLE, where=ended)
+        idle = np.equal(stage, IDLE, out=self._idle[:n])
+        if idle.any():
+            self._retire(idle)
+        return out
+
+    def _read_samples(self, wave, index):
+        """
+        Resampled sample data of every voice into wave (voices, frames).
+        Returns the mask of voices whose sample ended in this block.
+        """
+        n, frames = wave.shape
+        ended = self._ended[:n]
+        ended.fill(False)
+        pos = self._pos_buf[:frames]
+        floor = self._floor_buf[:frames]
+        a = self._a_buf[:frames]
+        b = self._b_buf[:frames]
+        index = index[:frames]
+        for v in range(n):
+            data = self.sample[v]
+            row = wave[v]
+            if data is None:
+                zone = self.sample_zone[v]
+                if zone is None:
+                    # Started before a sampler was set
+                    row.fill(0.0)
+                    ended[v] = True
+                    continue
+                data = zone.data
+                if data is None:
+                    row.fill(0.0)  # still loading: silent, keeps its place
+                    continue
+                self.sample[v] = data
+            start = self.sample_pos[v]
+            step = self.sample_step[v]
+            np.multiply(self._ramp[:frames], step, out=pos)
+            pos += start
+            np.floor(pos, out=floor)
+            np.copyto(index, floor, casting='unsafe')
+            pos -= floor  # fraction between the two samples
+            raw = self._raw_bufs[data.dtype][:frames]
+            np.take(data, index, out=raw, mode='clip')
+            np.copyto(a, raw)
+            index += 1
+            np.take(data, index, out=raw, mode='clip')
+            np.copyto(b, raw)
+            b -= a
+            b *= pos
+            a += b
+            a *= self.sample_scale[v]
+            last = len(data) - 1
+            self.sample_pos[v] = start + frames * step
+            if self.sample_pos[v] >= last:
+                # Silence from the last sample on; the voice retires
+                a[max(0, int(np.ceil((last - start) / step))):] = 0.0
+                ended[v] = True
+            np.copyto(row, a, casting='same_kind')
+        return ended
+# --- END Voice Pool Block ---
@@ -0,0 +1,125 @@
+import numpy as np
+
+
+""" --- Wavetable Oscillator Block ---
+Band-limited single-cycle tables for every WAVE_TYPE, mip-mapped per
+octave: the table used for a note only contains harmonics that stay
+below Nyquist for the highest frequency of its octave.
+"""
+TABLE_SIZE = 2048
+BASE_FREQ = 20.0  # lowest frequency of the first mip level (Hz)
+WAVE_TYPES = ('sine', 'square', 'triangle', 'sawtooth')
+
+
+def _harmonics(wave_type, count):
+    """
+    Fourier series of the waveform, matching the phase of the
+    formulas it replaces (sin(2*pi*x), sign(sin), triangle, saw).
+    Returns (sin_amps, cos_amps) for harmonics 0..count
+    """
+    k = np.arange(count + 1, dtype=float)
+    sin_amps = np.zeros(count + 1)
+    cos_amps = np.zeros(count + 1)
+    odd = (k % 2 == 1)
+    if wave_type == 'square':
+        sin_amps[odd] = 4 / (np.pi * k[odd])
+    elif wave_type == 'triangle':
+        cos_amps[odd] = -8 / (np.pi ** 2 * k[odd] ** 2)
+    elif wave_type == 'sawtooth':
+        sin_amps[1:] = 2 / (np.pi * k[1:]) * np.where(k[1:] % 2 == 1, 1, -1)
+    elif count >= 1:
+        sin_amps[1] = 1.0
+    return sin_amps, cos_amps
+
+
+_BANKS = {}  # (fs, table_size, dtype) -> shared WavetableBank
+
+
+def wavetable_bank(fs, table_size=TABLE_SIZE, dtype=np.float64):
+    """
+    Bank shared by every voice pool with the same settings; the tables
+    are read-only, so building them once per process is enough
+    """
+    key = (fs, table_size, np.dtype(dtype))
+    bank = _BANKS.get(key)
+    if bank is None:
+        bank = _BANKS[key] = WavetableBank(fs, table_size, dtype)
+        for table in bank.tables.values():
+            table.flags.writeable = False
+    return bank
+
+
+class WavetableBank:
+    """
+    Precomputed tables, built once at startup.
+    tables[wave_type] has shape (levels, TABLE_SIZE + 1); the extra
+    guard sample makes linear interpolation wrap without a modulo.
+    """
+    __slots__ = ('fs', 'levels', 'tables')
+
+    def __init__(self, fs, table_size=TABLE_SIZE, dtype=np.float64):
+        self.fs = fs
+        nyquist = fs / 2
+        self.levels = max(1, int(np.ceil(np.log2(nyquist / BASE_FREQ))))
+        self.tables = {}
+        for wave_type in WAVE_TYPES:
+            bank = np.empty((self.levels, table_size + 1))
+            for level in range(self.levels):
+                top = BASE_FREQ * 2 ** (level + 1)
+                count = min(int(nyquist // top), table_size // 2 - 1)
+                sin_amps, cos_amps = _harmonics(wave_type, count)
+                spectrum = np.zeros(table_size // 2 + 1, dtype=complex)
+                spectrum[:count + 1] = (cos_amps - 1j * sin_amps) * \
+                    (table_size / 2)
+                bank[level, :table_size] = np.fft.irfft(spectrum, table_size)
+                bank[level, table_size] = bank[level, 0]
+            self.tables[wave_type] = bank.astype(dtype)
+
+    def level_for(self, freq):
+        """ Mip level (octave) for each frequency """
+        level = np.floor(np.log2(np.maximum(freq, BASE_FREQ) / BASE_FREQ))
+        return np.minimum(level, self.levels - 1).astype(np.intp)
+
+    def offset_for(self, freq):
+        """ Start of the frequency's mip level in the flattened bank """
+        row = self.tables['sine'].shape[1]
+        return self.level_for(freq) * row
+
+    def read(self, wave_type, freq, phase):
+        """
+        freq: (voices,) frequencies, phase: (voices, frames) in cycles [0, 1)
+        Returns (voices, frames) samples, linearly interpolated
+        """
+        bank = self.tables.get(wave_type, self.tables['sine'])
+        offsets = np.empty(phase.shape, dtype=bank.dtype)
+        offsets[:] = self.offset_for(freq)[:, None]
+        return self.read_into(wave_type, phase.astype(bank.dtype), offsets,
+                              np.empty_like(offsets),
+                              np.empty(phase.shape, dtype=np.intp))
+
+    def read_into(self, wave_type, phase, offsets, out, index):
+        """
+        Allocation-free read for the audio thread. All arguments are
+        contiguous (voices, frames) arrays: phase in cycles, offsets
+        (offset_for of each voice, repeated over the frames) in the
+        table dtype, out for the result and an intp index array.
+        phase and offsets are used as work space.
+        Returns out
+        """
+        bank = self.tables.get(wave_type, self.tables['sine'])
+        size = bank.shape[1] - 1
+        phase *= size
+        np.floor(phase, out=out)
+        phase -= out
+        # Index straight into the flattened bank: row offset + position
+        offsets += out
+        np.copyto(index, offsets, casting='unsafe')
+        flat = bank.ravel()
+        np.take(flat, index, out=out, mode='clip')
+        index += 1
+        hi = np.take(flat, index, out=offsets, mode='clip')
+        hi -= out
+        hi *= phase
+        out += hi
+        return out
+# --- END Wavetable Oscillator Block ---
@@ -0,0 +1,110 @@
+import struct
+
+import numpy as np
+
+
+""" --- WAV File Block ---
+Minimal RIFF/WAVE reader for 8/16/24/32-bit PCM and 32/64-bit float
+files (the standard library wave module has no float support), plus
+the header writer used for recordings.
+"""
+WAV_HEADER_SIZE = 44  # RIFF + fmt + data chunk headers written below
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo:
+    __slots__ = ('path', 'fs', 'channels', 'bits', 'float', 'offset',
+                 'frames')
+
+    def __init__(self, path, fs, channels, bits, is_float, offset, frames):
+        self.path = path
+        self.fs = fs
+        self.channels = channels
+        self.bits = bits
+        self.float = is_float
+        self.offset = offset  # byte offset of the sample data
+        self.frames = frames
+
+    @property
+    def dtype(self):
+        """ NumPy dtype of one sample on disk (None for 24-bit PCM) """
+        if self.float:
+            return np.dtype('<f4') if self.bits == 32 else np.dtype('<f8')
+        return {8: np.dtype('u1'), 16: np.dtype('<i2'),
+                32: np.dtype('<i4')}.get(self.bits)
+
+    @property
+    def scale(self):
+        """ Factor that maps stored integers to -1.0 ... 1.0 """
+        if self.float:
+            return 1.0
+        return 1.0 / (1 << (self.bits - 1))
+
+
+def wav_info(path):
+    """ Parse the header chunks of a WAV file """
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{path}: not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path}: no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size)
+                tag, channels, fs, _, _, bits = \
+                    struct.unpack('<HHIIHH', body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack('<H', body[24:26])[0]
+                if tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                    raise ValueError(f"{path}: unsupported format {tag}")
+                fmt = (fs, channels, bits, tag == WAVE_FORMAT_IEEE_FLOAT)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path}: data before fmt chunk")
+                fs, channels, bits, is_float = fmt
+                frames = size // (channels * bits // 8)
+                return WavInfo(path, fs, channels, bits, is_float,
+                               f.tell(), frames)
+            else:
+                f.seek(size + (size & 1), 1)
+            if chunk_id == b'fmt ' and size & 1:
+                f.seek(1, 1)
+
+
+def wav_header(fs, channels, bits, is_float, frames):
+    """ Canonical 44-byte header for frames of sample data """
+    block_align = channels * bits // 8
+    size = frames * block_align
+    tag = WAVE_FORMAT_IEEE_FLOAT if is_float else WAVE_FORMAT_PCM
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + size, b'WAVE',
+                       b'fmt ', 16, tag, channels, fs, fs * block_align,
+                       block_align, bits, b'data', size)
+
+
+def read_wav(path):
+    """
+    Returns (fs, samples) with samples as float64 of shape
+    (frames, channels) scaled to -1.0 ... 1.0
+    """
+    info = wav_info(path)
+    with open(path, 'rb') as f:
+        f.seek(info.offset)
+        raw = f.read(info.frames * info.channels * info.bits // 8)
+    if info.bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        data = (b[:, 0].astype(np.int32) | (b[:, 1].astype(np.int32) << 8)
+                | (b[:, 2].astype(np.int8).astype(np.int32) << 16))
+    else:
+        data = np.frombuffer(raw, dtype=info.dtype)
+    samples = data.astype(np.float64)
+    if info.bits == 8 and not info.float:
+        samples -= 128.0
+    samples *= info.scale
+    return info.fs, samples.reshape(-1, info.channels)
+# --- END WAV File Block ---
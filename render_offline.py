@@ -0,0 +1,307 @@
+"""
+Headless offline renderer: note-event file -> WAV, faster than real time.
+Uses the same Synth (voices + effects chain) as app_console.py, without
+sounddevice or pynput.
+
+Event files:
+  .mid / .midi  Standard MIDI File (format 0 or 1)
+  .json         [{"time": 0.0, "note": "z", "on": true},
+                 {"time": 0.5, "note": 60, "on": false},
+                 {"time": 1.0, "set": {"wave_type": "square",
+                                      "delay.delay_sec": 0.25}}]
+                or {"events": [...]}
+  .csv          time,note,on|off   (one event per line)
+Notes are keyboard keys from NOTE_KEYS or MIDI note numbers.
+
+Usage: python render_offline.py events.json out.wav [--blocksize 64]
+       [--wave sine] [--reverb] [--chorus] [--delay] [--tail 1.0]
+       [--conv-reverb [IR.wav]] [--samples DIR] [--filter HZ]
+       [--resonance 0.3] [--filter-env OCT] [--trace trace.json]
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import time
+import wave
+
+import numpy as np
+
+from pyano.synth import Synth, FS, NOTE_KEYS, midi_to_freq
+from pyano.profiler import PROFILER
+
+
+# --- Event Loading Block ---
+def _note(value):
+    """ Voice key and frequency for a keyboard key or MIDI note number """
+    if isinstance(value, str) and value in NOTE_KEYS:
+        return value, NOTE_KEYS[value]
+    note = int(value)
+    return note, midi_to_freq(note)
+
+
+def load_json_events(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('events', [])
+    events = []
+    for item in data:
+        when = float(item['time'])
+        if 'set' in item:
+            events.append((when, 'set', None, dict(item['set'])))
+        else:
+            key, freq = _note(item['note'])
+            events.append((when, 'on' if item.get('on', True) else 'off',
+                           key, freq))
+    return events
+
+
+def load_csv_events(path):
+    events = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith('#'):
+                continue
+            try:
+                when = float(row[0])
+            except ValueError:
+                continue  # header line
+            key, freq = _note(row[1].strip())
+            state = row[2].strip().lower() if len(row) > 2 else 'on'
+            events.append((when, 'off' if state in ('off', '0', 'false')
+                           else 'on', key, freq))
+    return events
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def load_midi_events(path):
+    """ Note on/off events of a Standard MIDI File, in seconds """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'MThd':
+        raise ValueError(f"{path}: not a Standard MIDI File")
+    header_len = struct.unpack('>I', data[4:8])[0]
+    _, ntracks, division = struct.unpack('>HHH', data[8:14])
+    if division & 0x8000:
+        raise ValueError(f"{path}: SMPTE time division is not supported")
+    pos = 8 + header_len
+
+    raw = []  # (tick, order, kind, note or tempo)
+    order = 0
+    for _ in range(ntracks):
+        if data[pos:pos + 4] != b'MTrk':
+            raise ValueError(f"{path}: bad track chunk at byte {pos}")
+        length = struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        pos += 8
+        end = pos + length
+        tick = 0
+        status = 0
+        while pos < end:
+            delta, pos = _read_varlen(data, pos)
+            tick += delta
+            if data[pos] & 0x80:
+                status = data[pos]
+                pos += 1
+            if status == 0xFF:
+                meta = data[pos]
+                length, pos = _read_varlen(data, pos + 1)
+                if meta == 0x51:  # tempo, microseconds per quarter note
+                    tempo = int.from_bytes(data[pos:pos + 3], 'big')
+                    raw.append((tick, order, 'tempo', tempo))
+                pos += length
+                status = 0
+            elif status in (0xF0, 0xF7):
+                length, pos = _read_varlen(data, pos)
+                pos += length
+                status = 0
+            else:
+                kind = status & 0xF0
+                if kind in (0xC0, 0xD0):
+                    pos += 1
+                    continue
+                note, velocity = data[pos], data[pos + 1]
+                pos += 2
+                if kind == 0x90 and velocity > 0:
+                    raw.append((tick, order, 'on', note))
+                elif kind == 0x80 or kind == 0x90:
+                    raw.append((tick, order, 'off', note))
+            order += 1
+        pos = end
+
+    # Ticks to seconds through the tempo map
+    raw.sort(key=lambda e: (e[0], e[1]))
+    events = []
+    tempo = 500000  # 120 bpm
+    last_tick = 0
+    seconds = 0.0
+    for tick, _, kind, value in raw:
+        seconds += (tick - last_tick) * tempo / (division * 1e6)
+        last_tick = tick
+        if kind == 'tempo':
+            tempo = value
+        else:
+            events.append((seconds, kind, value, midi_to_freq(value)))
+    return events
+
+
+def load_events(path):
+    """
+    Returns a time-sorted list of (time_sec, kind, key, value) where kind
+    is 'on'/'off' (value = frequency) or 'set' (value = parameter dict)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.mid', '.midi'):
+        events = load_midi_events(path)
+    elif ext == '.json':
+        events = load_json_events(path)
+    elif ext == '.csv':
+        events = load_csv_events(path)
+    else:
+        raise ValueError(f"Unknown event file type: {path}")
+    # Stable sort keeps file order for simultaneous events
+    return sorted(events, key=lambda e: e[0])
+# --- END Event Loading Block ---
+
+
+# --- Offline Render Block ---
+def apply_event(synth, event):
+    _, kind, key, value = event
+    if kind == 'on':
+        synth.note_on(key, value)
+    elif kind == 'off':
+        synth.note_off(key)
+    else:
+        synth.configure(value)
+
+
+def render_events(synth, events, write, blocksize=64, tail=1.0):
+    """
+    Render the events block by block, calling write(signal) for every
+    block. Blocks are split at event times, so onsets are sample-exact.
+    Returns the number of frames rendered.
+    """
+    fs = synth.fs
+    pos = 0
+    for event in events:
+        target = int(round(event[0] * fs))
+        while pos < target:
+            n = min(blocksize, target - pos)
+            write(synth.render(n))
+            pos += n
+        apply_event(synth, event)
+    end = pos + int(tail * fs)
+    while pos < end:
+        n = min(blocksize, end - pos)
+        write(synth.render(n))
+        pos += n
+    return pos
+
+
+def render_file(events_path, wav_path, synth=None, blocksize=64, tail=1.0):
+    """
+    Render an event file to a 16-bit mono WAV.
+    Returns stats: audio seconds, wall seconds and real-time factor
+    (wall / audio, below 1.0 means faster than real time).
+    """
+    synth = synth if synth is not None else Synth(FS)
+    events = load_events(events_path)
+    start = time.perf_counter()
+    with wave.open(wav_path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(synth.fs)
+
+        def write(signal):
+            pcm = np.clip(signal, -1.0, 1.0) * 32767
+            wav.writeframesraw(pcm.astype('<i2').tobytes())
+
+        frames = render_events(synth, events, write, blocksize, tail)
+    wall = time.perf_counter() - start
+    audio = frames / synth.fs
+    return {
+        'events': len(events),
+        'frames': frames,
+        'audio_sec': audio,
+        'wall_sec': wall,
+        'realtime_factor': wall / audio if audio else 0.0,
+    }
+# --- END Offline Render Block ---
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('events', help='.mid/.midi, .json or .csv file')
+    parser.add_argument('output', help='output WAV file')
+    parser.add_argument('--blocksize', type=int, default=64)
+    parser.add_argument('--wave', default='sine',
+                        choices=['sine', 'square', 'triangle', 'sawtooth',
+                                 'sampler'])
+    parser.add_argument('--volume', type=float, default=0.5)
+    parser.add_argument('--reverb', action='store_true')
+    parser.add_argument('--chorus', action='store_true')
+    parser.add_argument('--delay', action='store_true')
+    parser.add_argument('--conv-reverb', nargs='?', const='', metavar='IR',
+                        help='convolution reverb, optionally with an '
+                        'impulse response WAV')
+    parser.add_argument('--samples', metavar='DIR',
+                        help='multisampled WAV directory for --wave sampler')
+    parser.add_argument('--filter', type=float, metavar='HZ',
+                        help='resonant low-pass on every voice at this cutoff')
+    parser.add_argument('--resonance', type=float, default=0.3)
+    parser.add_argument('--filter-env', type=float, default=0.0,
+                        metavar='OCT', help='octaves the envelope opens '
+                        'the filter')
+    parser.add_argument('--tail', type=float, default=1.0,
+                        help='seconds rendered after the last event')
+    parser.add_argument('--trace', metavar='JSON',
+                        help='write per-stage spans as a Chrome trace '
+                        '(chrome://tracing, Perfetto)')
+    args = parser.parse_args()
+
+    synth = Synth(FS, blocksize=args.blocksize)
+    if args.samples:
+        # Offline every note must sound: load zones inline
+        synth.load_samples(args.samples, background=False)
+    elif args.wave == 'sampler':
+        parser.error('--wave sampler needs --samples DIR')
+    synth.wave_type = args.wave
+    synth.amplitude = args.volume
+    synth.set_reverb(args.reverb)
+    synth.set_chorus(args.chorus)
+    synth.set_delay(args.delay)
+    if args.filter is not None:
+        synth.filter.cutoff = args.filter
+        synth.filter.resonance = args.resonance
+        synth.filter.env_amount = args.filter_env
+        synth.set_filter(True)
+    if args.conv_reverb is not None:
+        synth.load_impulse_response(args.conv_reverb or None)
+        synth.set_conv_reverb(True)
+    PROFILER.enable(bool(args.trace))
+    stats = render_file(args.events, args.output, synth,
+                        args.blocksize, args.tail)
+    if args.trace:
+        PROFILER.enable(False)
+        PROFILER.export(args.trace)
+        for name, s in PROFILER.stats().items():
+            print(f"  {name:12s} n={s['count']:6d} mean={s['mean_us']:8.1f} us "
+                  f"max={s['max_us']:8.1f} us")
+    print(f"Rendered {stats['events']} events, {stats['audio_sec']:.2f} s "
+          f"of audio in {stats['wall_sec']:.2f} s")
+    print(f"Real-time factor: {stats['realtime_factor']:.3f} "
+          f"({1 / max(stats['realtime_factor'], 1e-9):.1f}x real time)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
-import sounddevice as sd
+from pyano.devices import DeviceProbe
 
 device_index = 8  # Встановіть потрібний індекс
-info = sd.query_devices(device_index)
-print(f"Device: {info['name']}")
-print(f"Default sample rate: {info['default_samplerate']}")
+probe = DeviceProbe()
+info = probe.device(device_index)
+print(f"Device: {info.name} ({info.hostapi})")
+print(f"Default sample rate: {info.default_samplerate}")
+print(f"Supported sample rates: {probe.samplerates(info)}")